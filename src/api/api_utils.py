@@ -6,6 +6,15 @@ from loguru import logger
 from starlette.responses import JSONResponse
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY, HTTP_404_NOT_FOUND
 
+from src.json_codec import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse with encoder of json_codec, orjson if it is installed"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
 
 async def logging_dependency(request: Request):
     body_content = await request.body()
@@ -36,7 +45,7 @@ async def custom_request_validation_exception_handler(request: Request,
                  f">>client_headers: {request.headers} "
                  f">>errors: {errors}")
 
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=HTTP_422_UNPROCESSABLE_ENTITY,
         content={"status": "error", "msg": " ### ".join(errors)}
     )
@@ -49,7 +58,7 @@ async def custom_404_handler(request: Request, __):
         "status": "error",
         "msg": msg
     }
-    return JSONResponse(content=response, status_code=HTTP_404_NOT_FOUND)
+    return FastJSONResponse(content=response, status_code=HTTP_404_NOT_FOUND)
 
 
 async def add_process_time_header(request: Request, call_next):
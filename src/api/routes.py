@@ -3,8 +3,8 @@ from datetime import datetime
 from fastapi import APIRouter
 from loguru import logger
 from pydantic import BaseModel
-from starlette.responses import JSONResponse
 
+from src.api.api_utils import FastJSONResponse
 from src.config import Config
 from src.manager import Manager
 
@@ -30,26 +30,29 @@ class Routers(object):
         self.router.add_api_route(path="/", endpoint=self.get_root, methods=["GET"], tags=["Common"])
         self.router.add_api_route(path="/diag", endpoint=self.get_diag, methods=["GET"], tags=["Common"])
         self.router.add_api_route(path="/stats", endpoint=self.get_stats, methods=["GET"], tags=["Common"])
+        self.router.add_api_route(path="/call_pacer", endpoint=self.get_call_pacer, methods=["GET"], tags=["Common"])
+        self.router.add_api_route(path="/connection_pool", endpoint=self.get_connection_pool, methods=["GET"],
+                                  tags=["Common"])
         self.router.add_api_route(path="/restart", endpoint=self.restart, methods=["POST"], tags=["Common"])
 
         self.router.add_api_route(path="/skill/chart/{skill_id}", endpoint=self.get_skill_chart,
                                   methods=["GET"], tags=["Chart"])
 
     def get_root(self):
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "app": self.config.app,
             "host": self.config.app_api_host,
             "port": self.config.app_api_port
         })
 
     def get_diag(self):
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "status": "ok",
             "app": self.config.app
         })
 
     def get_stats(self):
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "status": "ok",
             "app": self.config.app,
             "app_api_host": self.config.app_api_host,
@@ -61,10 +64,16 @@ class Routers(object):
             "alive": self.config.alive
         })
 
+    def get_call_pacer(self):
+        return FastJSONResponse(content=self.manager.call_pacer.get_stats())
+
+    def get_connection_pool(self):
+        return FastJSONResponse(content=self.manager.connection_pool.get_stats())
+
     def restart(self):
         self.config.wait_shutdown = True
 
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "app": self.config.app,
             "host": self.config.app_api_host,
             "port": self.config.app_api_port,
@@ -93,7 +102,7 @@ class Routers(object):
             dataset3.append(row[3])
             dataset4.append(row[4])
 
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "skill_id": skill_id,
             "batch_size": batch_size,
             "labels": labels,
@@ -0,0 +1,111 @@
+import random
+import time
+
+from loguru import logger
+
+from src.config import Config
+from src.http_clients.call_direct_client import CallDirectClient
+
+CIRCUIT_CLOSED = 'closed'  # calls go to node
+CIRCUIT_OPEN = 'open'  # node is ejected until open_until
+CIRCUIT_HALF_OPEN = 'half_open'  # one probe call decides if node is back
+
+
+class CallDirectNode(object):
+    """Health of one CallDirect"""
+
+    def __init__(self, call_direct_client: CallDirectClient):
+        self.call_direct_client: CallDirectClient = call_direct_client
+        self.api_url: str = call_direct_client.api_url
+        self.state: str = CIRCUIT_CLOSED
+        self.open_until: float = 0
+        self.in_flight: int = 0
+        self.ewma_latency: float = 0.0
+        self.ewma_error_rate: float = 0.0
+        self.consecutive_failures: int = 0
+        self.count_success: int = 0
+        self.count_failed: int = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "latency": round(self.ewma_latency, 3),
+            "error_rate": round(self.ewma_error_rate, 3),
+            "count_success": self.count_success,
+            "count_failed": self.count_failed
+        }
+
+
+class CallDirectBalancer(object):
+    """
+    Choose CallDirect with least outstanding calls weighted by latency
+    Circuit breaker ejects node after failures and returns it after a successful probe
+    """
+
+    def __init__(self, config: Config, call_direct_clients: list[CallDirectClient]):
+        self.config: Config = config
+        self.call_direct_clients: list[CallDirectClient] = call_direct_clients
+        self.nodes: dict[str, CallDirectNode] = {}
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+    def get_node(self, call_direct_client: CallDirectClient) -> CallDirectNode:
+        node = self.nodes.get(call_direct_client.api_url)
+        if node is None:
+            node = CallDirectNode(call_direct_client)
+            self.nodes[node.api_url] = node
+        return node
+
+    def is_available(self, node: CallDirectNode, now: float) -> bool:
+        if node.state == CIRCUIT_OPEN and now >= node.open_until:
+            node.state = CIRCUIT_HALF_OPEN
+            self.log.info(f'{node.api_url} half open, wait probe call')
+        if node.state == CIRCUIT_HALF_OPEN:
+            return node.in_flight == 0
+        return node.state == CIRCUIT_CLOSED
+
+    def rank_nodes(self, now: float) -> list[CallDirectNode]:
+        """Available nodes, the best is first"""
+        nodes = [self.get_node(call_direct_client) for call_direct_client in self.call_direct_clients]
+        nodes = [node for node in nodes if self.is_available(node, now)]
+        # random first, so nodes with equal score share calls
+        random.shuffle(nodes)
+        nodes.sort(key=lambda node: (node.in_flight + 1) * max(node.ewma_latency, 0.001))
+        return nodes
+
+    def on_start(self, node: CallDirectNode, count: int = 1):
+        node.in_flight += count
+
+    def on_cancel(self, node: CallDirectNode, count: int = 1):
+        """Calls were not sent, they do not change health of node"""
+        node.in_flight -= count
+
+    def on_end(self, node: CallDirectNode, success: bool, latency: float):
+        alpha = self.config.call_direct_ewma_alpha
+        node.in_flight -= 1
+        node.ewma_latency = latency if node.ewma_latency == 0 else alpha * latency + (1 - alpha) * node.ewma_latency
+        node.ewma_error_rate = alpha * (0 if success else 1) + (1 - alpha) * node.ewma_error_rate
+
+        if success:
+            node.count_success += 1
+            node.consecutive_failures = 0
+            if node.state == CIRCUIT_HALF_OPEN:
+                node.state = CIRCUIT_CLOSED
+                node.ewma_error_rate = 0
+                self.log.info(f'{node.api_url} closed, probe call is success')
+            return
+
+        node.count_failed += 1
+        node.consecutive_failures += 1
+        if (node.state == CIRCUIT_HALF_OPEN
+                or node.consecutive_failures >= self.config.call_direct_failures_to_open
+                or node.ewma_error_rate >= self.config.call_direct_error_rate_to_open):
+            if node.state != CIRCUIT_OPEN:
+                self.log.warning(f'{node.api_url} open for {self.config.call_direct_open_time} seconds, '
+                                 f'consecutive_failures={node.consecutive_failures} '
+                                 f'error_rate={round(node.ewma_error_rate, 3)}')
+            node.state = CIRCUIT_OPEN
+            node.open_until = time.monotonic() + self.config.call_direct_open_time
+
+    def get_stats(self) -> dict:
+        return {api_url: node.get_stats() for api_url, node in self.nodes.items()}
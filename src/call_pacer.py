@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import time
+from typing import Optional
+
+from loguru import logger
+
+from src.call_direct_balancer import CIRCUIT_HALF_OPEN, CallDirectBalancer, CallDirectNode
+from src.config import Config
+from src.http_clients.call_direct_client import CallDirectClient
+
+
+class CallPacer(object):
+    """
+    One queue of call starts for all skills
+    Leads wait in a heap by due time, every CallDirect gets no more than call_direct_cps calls per second
+    and no more than call_direct_max_in_flight calls without answer, CallDirectBalancer chooses the address
+    Leads due within call_pacer_batch_window go to CallDirect in one request if it supports batches
+    """
+
+    def __init__(self, config: Config, call_direct_clients: list[CallDirectClient]):
+        self.config: Config = config
+        self.call_direct_clients: list[CallDirectClient] = call_direct_clients
+        self.queue: list[tuple[float, int, int, dict]] = []  # heap of (due monotonic time, sequence, skill_id, lead)
+        self.sequence: int = 0
+        self.pending: dict[int, int] = {}  # leads of skill in the queue
+        self.outstanding: dict[int, int] = {}  # calls of skill sent to CallDirect without answer
+        self.call_tasks: set[asyncio.Task] = set()  # started calls, the loop keeps only weak references to tasks
+        self.new_lead_event: asyncio.Event = asyncio.Event()
+        self.balancer: CallDirectBalancer = CallDirectBalancer(config=config, call_direct_clients=call_direct_clients)
+        self.tokens: dict[str, float] = {}  # token bucket of every address
+        self.token_times: dict[str, float] = {}
+        self.count_started: int = 0
+        self.count_failed: int = 0
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+    def schedule(self, skill_id: int, leads: list[dict], interval: float):
+        """
+        Spread call starts of leads evenly over interval from now
+
+        @param skill_id: Skill of leads
+        @param leads: Leads from DbBuffer
+        @param interval: Seconds, usually update_time of skill
+        @return None
+        """
+        if not leads:
+            return
+
+        now = time.monotonic()
+        step = interval / len(leads)
+        for number, lead in enumerate(leads):
+            self.sequence += 1
+            self.push((now + number * step, self.sequence, skill_id, lead))
+        self.new_lead_event.set()
+
+    def push(self, item: tuple[float, int, int, dict]):
+        heapq.heappush(self.queue, item)
+        self.pending[item[2]] = self.pending.get(item[2], 0) + 1
+
+    def pop(self) -> tuple[float, int, int, dict]:
+        item = heapq.heappop(self.queue)
+        self.pending[item[2]] -= 1
+        return item
+
+    def get_in_flight(self, skill_id: int) -> int:
+        """Calls of skill that are waiting in the queue or sent to CallDirect without answer"""
+        return self.pending.get(skill_id, 0) + self.outstanding.get(skill_id, 0)
+
+    def take_tokens(self, node: CallDirectNode, now: float, count: int) -> int:
+        """
+        Tokens for up to count calls within limits of node
+
+        @return count of allowed calls
+        """
+        cps = self.config.call_direct_cps
+        api_url = node.api_url
+        tokens = min(cps, self.tokens.get(api_url, cps) + (now - self.token_times.get(api_url, now)) * cps)
+        self.token_times[api_url] = now
+        if node.call_direct_client.batch_supported is False or node.state == CIRCUIT_HALF_OPEN:
+            count = 1
+        count = max(0, min(count, int(tokens), self.config.call_direct_max_in_flight - node.in_flight))
+        self.tokens[api_url] = tokens - count
+        return count
+
+    def select_node(self, now: float, count: int) -> tuple[Optional[CallDirectNode], int]:
+        """The best CallDirect from balancer that has tokens and free places for calls"""
+        for node in self.balancer.rank_nodes(now):
+            allowed = self.take_tokens(node, now, count)
+            if allowed > 0:
+                return node, allowed
+        return None, 0
+
+    async def start_call(self, node: CallDirectNode, skill_id: int, lead: dict):
+        self.balancer.on_start(node)
+        self.outstanding[skill_id] = self.outstanding.get(skill_id, 0) + 1
+        start_time = time.monotonic()
+        success = False
+        try:
+            success = await node.call_direct_client.start_call(lead=lead, delay=0)
+        except Exception as e:
+            self.log.exception(e)
+        finally:
+            self.balancer.on_end(node, success=success, latency=time.monotonic() - start_time)
+            self.outstanding[skill_id] -= 1
+
+        if success:
+            self.count_started += 1
+        else:
+            self.count_failed += 1
+
+    async def start_batch(self, node: CallDirectNode, items: list[tuple[float, int, int, dict]], now: float):
+        leads = [lead for _, _, _, lead in items]
+        offsets = [round(max(0.0, due_time - now), 3) for due_time, _, _, _ in items]
+        self.balancer.on_start(node, count=len(leads))
+        for _, _, skill_id, _ in items:
+            self.outstanding[skill_id] = self.outstanding.get(skill_id, 0) + 1
+        start_time = time.monotonic()
+        try:
+            results = await node.call_direct_client.start_calls(leads=leads, offsets=offsets)
+        except Exception as e:
+            self.log.exception(e)
+            results = [False] * len(leads)
+        finally:
+            for _, _, skill_id, _ in items:
+                self.outstanding[skill_id] -= 1
+
+        if results is None:
+            # CallDirect has no batch endpoint, leads go back to the queue for single calls
+            self.balancer.on_cancel(node, count=len(leads))
+            for item in items:
+                self.push(item)
+            self.new_lead_event.set()
+            return
+
+        latency = time.monotonic() - start_time
+        for success in results:
+            self.balancer.on_end(node, success=success, latency=latency)
+            if success:
+                self.count_started += 1
+            else:
+                self.count_failed += 1
+
+    async def wait_next(self, timeout: float):
+        try:
+            await asyncio.wait_for(self.new_lead_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.new_lead_event.clear()
+
+    async def start_pacer(self):
+        """Take due leads from the queue and start calls while limits of CallDirect allow"""
+        self.log.info('start_pacer')
+        while self.config.wait_shutdown is False:
+            now = time.monotonic()
+            if not self.queue:
+                await self.wait_next(timeout=1)
+                continue
+            if self.queue[0][0] > now:
+                await self.wait_next(timeout=self.queue[0][0] - now)
+                continue
+
+            items = [self.pop()]
+            batch_until = now + self.config.call_pacer_batch_window
+            if self.config.call_pacer_batch_window > 0 and any(call_direct_client.batch_supported
+                                                               for call_direct_client in self.call_direct_clients):
+                while self.queue and self.queue[0][0] <= batch_until and len(items) < self.config.call_pacer_max_batch:
+                    items.append(self.pop())
+
+            node, allowed = self.select_node(now, len(items))
+            for item in items[allowed:]:
+                self.push(item)
+            if node is None:
+                # all CallDirect are at the limit or ejected, a token comes in 1/cps seconds
+                await asyncio.sleep(1 / max(self.config.call_direct_cps, 1))
+                continue
+
+            if allowed == 1:
+                task = asyncio.create_task(self.start_call(node, items[0][2], items[0][3]))
+            else:
+                task = asyncio.create_task(self.start_batch(node, items[:allowed], now))
+            self.call_tasks.add(task)
+            task.add_done_callback(self.call_tasks.discard)
+
+            # give other tasks a chance when many leads are due at once
+            await asyncio.sleep(0)
+
+        self.log.info(f'end start_pacer, queue_depth={len(self.queue)}')
+
+    def remove_leads(self, skill_id: int) -> list[dict]:
+        """
+        Leads of skill leave the queue without calls, when the skill is not dialed by this worker anymore
+
+        @param skill_id: Skill of leads
+        @return removed leads, the first due is first
+        """
+        items = sorted(item for item in self.queue if item[2] == skill_id)
+        if items:
+            self.queue = [item for item in self.queue if item[2] != skill_id]
+            heapq.heapify(self.queue)
+            self.pending[skill_id] = 0
+        return [lead for _, _, _, lead in items]
+
+    def get_pending_leads(self) -> dict[int, list[dict]]:
+        """Leads in the queue by skill, the first due is first"""
+        pending_leads: dict[int, list[dict]] = {}
+        for _, _, skill_id, lead in sorted(self.queue):
+            pending_leads.setdefault(skill_id, []).append(lead)
+        return pending_leads
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "queue_depth": len(self.queue),
+            "due_now": sum(1 for due_time, _, _, _ in self.queue if due_time <= now),
+            "lag": round(now - self.queue[0][0], 3) if self.queue and self.queue[0][0] < now else 0,
+            "pending": {skill_id: count for skill_id, count in self.pending.items() if count},
+            "outstanding": {skill_id: count for skill_id, count in self.outstanding.items() if count},
+            "nodes": self.balancer.get_stats(),
+            "count_started": self.count_started,
+            "count_failed": self.count_failed
+        }
@@ -21,9 +21,45 @@ class Config(object):
         "mock_api_request": True,
         "oper_dispatcher_host": "127.0.0.1",
         "oper_dispatcher_port": 8090,
+        "oper_dispatcher_cache_ttl": 0.0,
+        "oper_dispatcher_subscribe": False,
         "db_buffer_host": "127.0.0.1",
         "db_buffer_port": 7005,
         "demo_log": True,
+        "skill_details_refresh_time": 5,
+        "skill_details_max_age": 15,
+        "skill_details_batch_retry_time": 300,
+        "lead_buffer_low_cycles": 1.0,
+        "lead_buffer_high_cycles": 2.0,
+        "lead_buffer_max_batch": 1000,
+        "lead_buffer_empty_delay": 5,
+        "skill_unit_idle_ttl": 600,
+        "skill_task_restart_delay": 1,
+        "skill_task_restart_max_delay": 60,
+        "shard_db_path": "",
+        "shard_worker_id": "",
+        "shard_lease_time": 30,
+        "call_direct_cps": 50,
+        "call_direct_max_in_flight": 100,
+        "call_direct_ewma_alpha": 0.2,
+        "call_direct_failures_to_open": 5,
+        "call_direct_error_rate_to_open": 0.5,
+        "call_direct_open_time": 30,
+        "call_pacer_batch_window": 0.0,
+        "call_pacer_max_batch": 50,
+        "skill_max_in_flight": 1000,
+        "control_tick": 1.0,
+        "skill_stats_time": 5,
+        "state_snapshot_path": "state_snapshot.json",
+        "state_snapshot_time": 10,
+        "state_snapshot_max_age": 300,
+        "drain_timeout": 10,
+        "http_limit": 0,
+        "http_limit_per_host": 120,
+        "http_keepalive_timeout": 30,
+        "http_ttl_dns_cache": 300,
+        "http_connect_timeout": 5,
+        "http_total_timeout": 0,
         "call_direct_addresses": [
             "127.0.0.1:8200",
             "127.0.0.1:8201"
@@ -68,13 +104,77 @@ class Config(object):
 
         self.oper_dispatcher_host: str = str(self.new_config['oper_dispatcher_host'])
         self.oper_dispatcher_port: int = int(self.new_config['oper_dispatcher_port'])
+        # seconds when the same answer of OperDispatcher is served again, 0 - only concurrent requests are shared
+        self.oper_dispatcher_cache_ttl: float = float(self.new_config['oper_dispatcher_cache_ttl'])
+        # get changes of skills from WebSocket of OperDispatcher, polling works while the stream is closed
+        self.oper_dispatcher_subscribe: bool = bool(self.new_config['oper_dispatcher_subscribe'])
 
         self.db_buffer_host: str = str(self.new_config['db_buffer_host'])
         self.db_buffer_port: int = int(self.new_config['db_buffer_port'])
 
         self.demo_log: list = bool(self.new_config['demo_log'])
 
+        # Manager gets details of all active skills in one request, SkillUnit reads them from SkillDetailsCache
+        self.skill_details_refresh_time: int = int(self.new_config['skill_details_refresh_time'])
+        self.skill_details_max_age: int = int(self.new_config['skill_details_max_age'])  # older - SkillUnit asks itself
+        self.skill_details_batch_retry_time: int = int(self.new_config['skill_details_batch_retry_time'])
+
+        # LeadBuffer of skill is refilled below lead_buffer_low_cycles * leads of one cycle
+        # up to lead_buffer_high_cycles * leads of one cycle
+        self.lead_buffer_low_cycles: float = float(self.new_config['lead_buffer_low_cycles'])
+        self.lead_buffer_high_cycles: float = float(self.new_config['lead_buffer_high_cycles'])
+        self.lead_buffer_max_batch: int = int(self.new_config['lead_buffer_max_batch'])  # leads in one request
+        self.lead_buffer_empty_delay: int = int(self.new_config['lead_buffer_empty_delay'])  # DbBuffer has no leads
+
+        # SkillSupervisor removes SkillUnit inactive longer than skill_unit_idle_ttl seconds
+        # and restarts crashed tasks after skill_task_restart_delay * 2^n seconds, no more than max
+        self.skill_unit_idle_ttl: int = int(self.new_config['skill_unit_idle_ttl'])
+        self.skill_task_restart_delay: int = int(self.new_config['skill_task_restart_delay'])
+        self.skill_task_restart_max_delay: int = int(self.new_config['skill_task_restart_max_delay'])
+
+        # many workers share active skills by leases in SQLite file, empty path - this worker dials all skills
+        self.shard_db_path: str = str(self.new_config['shard_db_path'])
+        self.shard_worker_id: str = str(self.new_config['shard_worker_id'])  # empty - hostname and pid
+        self.shard_lease_time: int = int(self.new_config['shard_lease_time'])  # seconds
+
         self.call_direct_addresses: list = list(self.new_config['call_direct_addresses'])
+        # limits of CallPacer for every address
+        self.call_direct_cps: int = int(self.new_config['call_direct_cps'])  # new calls per second
+        self.call_direct_max_in_flight: int = int(self.new_config['call_direct_max_in_flight'])  # calls without answer
+        # CallDirectBalancer: weight of the last call in latency and error rate, when the address is ejected
+        self.call_direct_ewma_alpha: float = float(self.new_config['call_direct_ewma_alpha'])
+        self.call_direct_failures_to_open: int = int(self.new_config['call_direct_failures_to_open'])
+        self.call_direct_error_rate_to_open: float = float(self.new_config['call_direct_error_rate_to_open'])
+        self.call_direct_open_time: int = int(self.new_config['call_direct_open_time'])  # seconds before probe call
+        # leads due within this window (seconds) go in one /call/start_batch, 0 - one request per lead
+        self.call_pacer_batch_window: float = float(self.new_config['call_pacer_batch_window'])
+        self.call_pacer_max_batch: int = int(self.new_config['call_pacer_max_batch'])
+        # budget of skill: leads in the queue of CallPacer + calls without answer, power is limited by it
+        self.skill_max_in_flight: int = int(self.new_config['skill_max_in_flight'])
+
+        # ControlScheduler runs PID of due skills every control_tick seconds
+        # and saves skill_chart of active skills every skill_stats_time seconds
+        self.control_tick: float = float(self.new_config['control_tick'])
+        self.skill_stats_time: int = int(self.new_config['skill_stats_time'])
+
+        # state of skills is saved every state_snapshot_time seconds and by the drain before restart,
+        # a new process loads it if it is not older than state_snapshot_max_age, empty path - no snapshot
+        self.state_snapshot_path: str = str(self.new_config['state_snapshot_path'])
+        self.state_snapshot_time: int = int(self.new_config['state_snapshot_time'])
+        self.state_snapshot_max_age: int = int(self.new_config['state_snapshot_max_age'])
+        self.drain_timeout: int = int(self.new_config['drain_timeout'])  # seconds for answers of started calls
+
+        # one pool of connections for all http clients: http_limit connections in total (0 - no limit),
+        # http_limit_per_host for every host (0 - no limit), it is above call_direct_max_in_flight of CallDirect node,
+        # so the pool never queues calls that CallPacer already let through,
+        # idle connection is kept http_keepalive_timeout seconds,
+        # dns answer is cached http_ttl_dns_cache seconds (0 - no cache), http_total_timeout 0 - no timeout
+        self.http_limit: int = int(self.new_config['http_limit'])
+        self.http_limit_per_host: int = int(self.new_config['http_limit_per_host'])
+        self.http_keepalive_timeout: float = float(self.new_config['http_keepalive_timeout'])
+        self.http_ttl_dns_cache: int = int(self.new_config['http_ttl_dns_cache'])
+        self.http_connect_timeout: float = float(self.new_config['http_connect_timeout'])
+        self.http_total_timeout: float = float(self.new_config['http_total_timeout'])
 
     def get_different_type_variables(self) -> list:
         different: list[str] = []
@@ -0,0 +1,100 @@
+import asyncio
+import sqlite3
+import time
+
+import numpy as np
+from loguru import logger
+
+from src.config import Config
+from src.pid_bank import PidBank
+from src.skill_supervisor import SkillSupervisor
+from src.skill_unit import SkillUnit
+
+
+class ControlScheduler(object):
+    """
+    One loop for controllers of all skills instead of timers in every SkillUnit
+    Every control_tick seconds PID of all due skills runs in one step of PidBank,
+    every skill_stats_time seconds new details of skills are applied and rows of skill_chart are saved
+    PID is reset before every step like in start_booster before, so power is the proportional answer of this cycle
+    """
+
+    def __init__(self,
+                 config: Config,
+                 skill_supervisor: SkillSupervisor,
+                 pid_bank: PidBank,
+                 sqlite_connector: sqlite3.Connection):
+        self.config: Config = config
+        self.skill_supervisor: SkillSupervisor = skill_supervisor
+        self.skill_units: dict[int, SkillUnit] = skill_supervisor.skill_units
+        self.pid_bank: PidBank = pid_bank
+        self.sqlite_connector: sqlite3.Connection = sqlite_connector
+        self.next_stats_time: float = 0
+        self.count_ticks: int = 0
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+    def refresh_stats(self):
+        """Details of skills from cache, the same as background_refresh_oper_stats of every unit before"""
+        chart_rows = []
+        for skill_unit in self.skill_units.values():
+            skill_unit.refresh_pid_params()
+            if not skill_unit.active:
+                continue
+
+            skill_detail = skill_unit.skill_details_cache.get(skill_id=skill_unit.skill_id,
+                                                              max_age=self.config.skill_details_max_age)
+            if skill_detail is None:
+                # only skills without fresh details need their own request
+                self.skill_supervisor.start_refresh_details(skill_unit.skill_id)
+            else:
+                skill_unit.apply_skill_details(skill_detail)
+            chart_rows.append(skill_unit.get_skill_chart_row())
+
+        if not chart_rows:
+            return
+
+        try:
+            with self.sqlite_connector:
+                self.sqlite_connector.executemany(' INSERT INTO skill_chart '
+                                                  ' (skill_id, calc_time, cnt_online, cnt_busy, '
+                                                  '  cnt_wait_oper, power) '
+                                                  ' VALUES (?, ?, ?, ?, ?, ?)', chart_rows)
+        except Exception as e:
+            self.log.warning(e)
+
+    def tick(self, now: float):
+        if now >= self.next_stats_time:
+            self.next_stats_time = now + self.config.skill_stats_time
+            self.refresh_stats()
+
+        due_units = []
+        for skill_unit in self.skill_units.values():
+            if not skill_unit.active:
+                if skill_unit.current_power != 0:
+                    skill_unit.stop_booster()
+                skill_unit.next_control_time = now + skill_unit.update_time
+            elif skill_unit.next_control_time <= now:
+                due_units.append(skill_unit)
+
+        if not due_units:
+            return
+
+        skill_ids = [skill_unit.skill_id for skill_unit in due_units]
+        inputs = np.array([skill_unit.prepare_control() for skill_unit in due_units], dtype=float)
+        self.pid_bank.reset_many(skill_ids, now)
+        outputs = self.pid_bank.step(skill_ids, inputs, now)
+        for skill_unit, power in zip(due_units, outputs):
+            skill_unit.apply_power(power=power, now=now)
+        self.log.info(f'tick: skills={len(due_units)} power={int(outputs.sum())}')
+
+    async def start_scheduler(self):
+        self.log.info('start_scheduler')
+        while self.config.wait_shutdown is False:
+            await asyncio.sleep(self.config.control_tick)
+            self.count_ticks += 1
+            try:
+                self.tick(time.monotonic())
+            except Exception as e:
+                self.log.exception(e)
+
+        self.log.info('end start_scheduler')
@@ -0,0 +1,337 @@
+import math
+
+import numpy as np
+from loguru import logger
+
+# states of the call slots
+CALL_EMPTY = 0
+CALL_RING = 1  # before redirect_search: ring and IVR
+CALL_WAIT = 2  # waiting for a free oper until redirect_call
+CALL_TALK = 3  # talking with oper until date_end
+
+
+class BatchDemoSimulator(object):
+    """
+    Model of DemoSkillUnit for many param sets at once on a virtual clock
+
+    Every skill unit is one row of NumPy arrays: PID state, opers (row x oper) and call slots (row x slot).
+    One step advances all rows with array operations, in the same order as DemoSkillUnit.run_simulation:
+    booster, skill chart, occupy and release. Steps without due events are skipped and occupy runs only
+    for rows with due events, so the cost of a step hardly grows with rows: big batches pay off.
+    Waiting calls take free opers in slot order, which is close to but not exactly the call_id order of DemoSkillUnit.
+    Every row draws from its own streams, spawned from its seed as in DemoSkillUnit, so a row gets the same results
+    in any chunk and rows with the same seed get common random numbers.
+    """
+
+    def __init__(self, params: list[dict], step: float = 0.1, rest_time: int = 20, chart_tick: int = 5):
+        """
+        @param params: Params of DemoSkillUnit and seed for every row, see run_sweep.DEFAULT_GRID
+        @param step: Seconds of virtual time per step, the same as occupy_tick of DemoSkillUnit
+        @param rest_time: Rest of oper after every call in seconds
+        @param chart_tick: Seconds between samples of current_busy
+        """
+        self.params: list[dict] = params
+        self.step: float = step
+        self.rest_time: int = rest_time
+        self.chart_tick: int = chart_tick
+        self.log = logger.bind(object_id=self.__class__.__name__)
+        # ratio, call and delay streams of every row, the same draws as DemoSkillUnit.run_demo_calls
+        self.ratio_rngs: list[np.random.Generator] = []
+        self.call_rngs: list[np.random.Generator] = []
+        self.delay_rngs: list[np.random.Generator] = []
+        for row in params:
+            ratio_seed, call_seed, delay_seed = np.random.SeedSequence(row.get('seed')).spawn(3)
+            self.ratio_rngs.append(np.random.default_rng(ratio_seed))
+            self.call_rngs.append(np.random.default_rng(call_seed))
+            self.delay_rngs.append(np.random.default_rng(delay_seed))
+
+        def column(name: str, dtype=np.float64) -> np.ndarray:
+            return np.array([row[name] for row in params], dtype=dtype)
+
+        size = len(params)
+        self.kp: np.ndarray = column('kp')
+        self.ki: np.ndarray = column('ki')
+        self.kd: np.ndarray = column('kd')
+        self.update_time: np.ndarray = column('update_time')
+        self.oper_online: np.ndarray = column('oper_online', np.int64)
+        self.end_time: np.ndarray = column('duration') * 60
+
+        # PID state, the same math as simple_pid.PID with differential_on_measurement
+        self.setpoint: np.ndarray = np.round(self.oper_online * column('wanted_ratio'), 2)
+        self.output_min: np.ndarray = column('min_oper_power') * self.oper_online
+        self.output_max: np.ndarray = column('max_oper_power') * self.oper_online
+        self.integral: np.ndarray = np.zeros(size)
+        self.last_input: np.ndarray = np.full(size, np.nan)
+        self.last_time: np.ndarray = np.zeros(size)
+
+        self.current_power: np.ndarray = np.zeros(size)
+        self.next_booster: np.ndarray = np.zeros(size)
+        self.next_chart: np.ndarray = np.full(size, float(chart_tick))
+        self.finished: np.ndarray = np.zeros(size, dtype=bool)
+        self.next_event: np.ndarray = np.full(size, np.inf)  # nearest call event or end of oper rest
+
+        self.call_counter: np.ndarray = np.zeros(size, dtype=np.int64)
+        self.hotline_counter: np.ndarray = np.zeros(size, dtype=np.int64)
+        self.last_hotline_counter: np.ndarray = np.zeros(size, dtype=np.int64)
+        self.occupy_counter: np.ndarray = np.zeros(size, dtype=np.int64)
+        self.sum_busy: np.ndarray = np.zeros(size)
+        self.count_busy: np.ndarray = np.zeros(size, dtype=np.int64)
+
+        # opers: row x oper, oper_call is the call slot or -1
+        count_opers = int(self.oper_online.max())
+        self.oper_exists: np.ndarray = np.arange(count_opers)[None, :] < self.oper_online[:, None]
+        self.oper_call: np.ndarray = np.full((size, count_opers), -1, dtype=np.int64)
+        self.oper_rest_end: np.ndarray = np.zeros((size, count_opers))
+
+        # call slots: row x slot, the count of slots grows when needed
+        self.call_state: np.ndarray = np.zeros((size, 0), dtype=np.int8)
+        self.call_search: np.ndarray = np.zeros((size, 0))
+        self.call_redirect: np.ndarray = np.zeros((size, 0))
+        self.call_end: np.ndarray = np.zeros((size, 0))
+        self.call_oper: np.ndarray = np.zeros((size, 0), dtype=np.int64)
+        self.grow_call_slots(16)
+
+        self.current_time: float = 0.0
+        self.step_number: int = 0  # current_time is step_number * step
+        self.count_steps: int = 0  # steps that were run, idle steps are skipped
+
+    def grow_call_slots(self, count: int):
+        size = len(self.params)
+        self.call_state = np.hstack([self.call_state, np.zeros((size, count), dtype=np.int8)])
+        self.call_search = np.hstack([self.call_search, np.zeros((size, count))])
+        self.call_redirect = np.hstack([self.call_redirect, np.zeros((size, count))])
+        self.call_end = np.hstack([self.call_end, np.zeros((size, count))])
+        self.call_oper = np.hstack([self.call_oper, np.zeros((size, count), dtype=np.int64)])
+
+    def get_busy(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """current_busy and approximate_busy of rows, see DemoSkillUnit.refresh_busy_stats"""
+        now = self.current_time
+        oper_call = self.oper_call[rows]
+        talk = oper_call >= 0
+        dialog_second = now - np.take_along_axis(self.call_redirect[rows], np.maximum(oper_call, 0), axis=1)
+        oper_rest_end = self.oper_rest_end[rows]
+        rest = ~talk & self.oper_exists[rows] & (now < oper_rest_end)
+
+        current_busy = talk.sum(axis=1) + rest.sum(axis=1)
+        approximate_busy = (np.where(talk, np.where(dialog_second < 60, 1.0, 0.9), 0.0).sum(axis=1) +
+                            np.where(rest, (oper_rest_end - now) / self.rest_time * 0.6, 0.0).sum(axis=1))
+        return current_busy, approximate_busy
+
+    def run_pid(self, rows: np.ndarray, feedback: np.ndarray) -> np.ndarray:
+        now = self.current_time
+        dt = now - self.last_time[rows]
+        dt = np.where(dt > 0, dt, 1e-16)
+        last_input = self.last_input[rows]
+        d_input = np.where(np.isnan(last_input), 0.0, feedback - last_input)
+        error = self.setpoint[rows] - feedback
+
+        output_min, output_max = self.output_min[rows], self.output_max[rows]
+
+        integral = np.clip(self.integral[rows] + self.ki[rows] * error * dt, output_min, output_max)
+        output = self.kp[rows] * error + integral - self.kd[rows] * d_input / dt
+        output = np.clip(output, output_min, output_max)
+
+        self.integral[rows] = integral
+        self.last_input[rows] = feedback
+        self.last_time[rows] = now
+        return output
+
+    def run_booster(self, rows: np.ndarray):
+        """booster_step of DemoSkillUnit for rows, then new calls for rows that are not finished"""
+        current_busy, approximate_busy = self.get_busy(rows)
+        current_wait = (self.call_state[rows] == CALL_WAIT).sum(axis=1)
+
+        diff_hotline_counter = self.hotline_counter[rows] - self.last_hotline_counter[rows]
+        self.last_hotline_counter[rows] = self.hotline_counter[rows]
+
+        feedback = np.round(approximate_busy + current_wait + diff_hotline_counter, 3)
+        self.current_power[rows] = np.round(self.run_pid(rows, feedback), 3)
+        self.next_booster[rows] += self.update_time[rows]
+
+        over = self.current_time > self.end_time[rows]
+        if over.any():
+            self.finish_rows(rows[over])
+        rows = rows[~over]
+        if rows.size == 0:
+            return
+
+        # drawn every cycle, even without power, to keep ratio streams in step with DemoSkillUnit
+        ratio_noise = np.array([self.ratio_rngs[row].standard_normal(2) for row in rows.tolist()])
+        powered = self.current_power[rows] > 0
+        rows, ratio_noise = rows[powered], ratio_noise[powered]
+        if rows.size == 0:
+            return
+
+        power_time = self.current_power[rows] * self.update_time[rows]
+        self.call_counter[rows] += power_time.astype(np.int64)
+
+        answer_ratio = np.maximum(0.6 + 0.05 * ratio_noise[:, 0], 0)
+        redirect_ratio = np.maximum(0.005 + 0.002 * ratio_noise[:, 1], 0)
+        batch_size = (power_time * answer_ratio * redirect_ratio).astype(np.int64)
+        if batch_size.sum() <= 0:
+            return
+
+        self.add_calls(rows, batch_size)
+
+    def add_calls(self, rows: np.ndarray, batch_size: np.ndarray):
+        free = self.call_state[rows] == CALL_EMPTY
+        shortage = int((batch_size - free.sum(axis=1)).max())
+        if shortage > 0:
+            self.grow_call_slots(max(shortage, self.call_state.shape[1]))
+            free = self.call_state[rows] == CALL_EMPTY
+
+        # the first batch_size free slots of every row get new calls
+        free_rank = np.cumsum(free, axis=1) - 1
+        target = free & (free_rank < batch_size[:, None])
+        target_rows, target_slots = np.nonzero(target)
+        row_of_call = rows[target_rows]
+
+        # calls of a row take free slots in order, so the n-th call of a row gets the n-th draws of its streams
+        noise = np.concatenate([self.call_rngs[row].standard_normal((count, 4))
+                                for row, count in zip(rows.tolist(), batch_size.tolist()) if count > 0])
+        delay = np.concatenate([self.delay_rngs[row].random(count)
+                                for row, count in zip(rows.tolist(), batch_size.tolist()) if count > 0])
+
+        date_call = self.current_time + np.round(delay * self.update_time[row_of_call], 3)
+        ring_duration = np.maximum(16.5 + 3 * noise[:, 0], 6)
+        ivr_duration = np.maximum(31 + noise[:, 1], 6)
+        redirect_duration = np.maximum((80 + 15 * noise[:, 2]) * (1.2 + 0.25 * noise[:, 3]), 2)
+
+        redirect_search = date_call + ring_duration + ivr_duration
+        self.call_state[row_of_call, target_slots] = CALL_RING
+        self.call_search[row_of_call, target_slots] = redirect_search
+        self.call_redirect[row_of_call, target_slots] = redirect_search + 3
+        self.call_end[row_of_call, target_slots] = redirect_search + 3 + 1 + redirect_duration
+        np.minimum.at(self.next_event, row_of_call, redirect_search)
+
+    def finish_rows(self, rows: np.ndarray):
+        """Stats of finished rows are final, their calls and opers leave the model"""
+        self.finished[rows] = True
+        self.call_state[rows] = CALL_EMPTY
+        self.oper_exists[rows] = False
+        self.oper_call[rows] = -1
+        self.next_event[rows] = np.inf
+
+    def run_chart(self, rows: np.ndarray):
+        current_busy, _ = self.get_busy(rows)
+        self.sum_busy[rows] += current_busy
+        self.count_busy[rows] += 1
+        self.next_chart[rows] += self.chart_tick
+
+    def run_occupy_and_release(self, rows: np.ndarray):
+        """Occupy and release tick of DemoSkillUnit for rows with due events"""
+        now = self.current_time
+        call_state = self.call_state[rows]
+
+        ended = (call_state == CALL_TALK) & (self.call_end[rows] < now)
+        ended_rows, ended_slots = np.nonzero(ended)
+        if ended_rows.size:
+            call_state[ended] = CALL_EMPTY
+            ended_rows = rows[ended_rows]
+            self.oper_call[ended_rows, self.call_oper[ended_rows, ended_slots]] = -1
+
+        searching = (call_state == CALL_RING) & (self.call_search[rows] < now)
+        call_state[searching] = CALL_WAIT
+
+        hotline = (call_state == CALL_WAIT) & (self.call_redirect[rows] < now)
+        if hotline.any():
+            call_state[hotline] = CALL_EMPTY
+            self.hotline_counter[rows] += hotline.sum(axis=1)
+
+        waiting = call_state == CALL_WAIT
+        ready = self.oper_exists[rows] & (self.oper_call[rows] < 0) & (self.oper_rest_end[rows] < now)
+        count_match = np.minimum(waiting.sum(axis=1), ready.sum(axis=1))
+        match_numbers = np.nonzero(count_match)[0]
+        if match_numbers.size:
+            # k-th waiting call of the row takes k-th ready oper of the row
+            waiting = waiting[match_numbers]
+            wait_rank = np.cumsum(waiting, axis=1) - 1
+            match = waiting & (wait_rank < count_match[match_numbers, None])
+            match_rows, match_slots = np.nonzero(match)
+            ready_order = np.argsort(~ready[match_numbers], axis=1, kind='stable')
+            match_opers = ready_order[match_rows, wait_rank[match_rows, match_slots]]
+            call_state[match_numbers[match_rows], match_slots] = CALL_TALK
+            match_rows = rows[match_numbers[match_rows]]
+
+            self.oper_call[match_rows, match_opers] = match_slots
+            self.call_oper[match_rows, match_slots] = match_opers
+            self.oper_rest_end[match_rows, match_opers] = self.call_end[match_rows, match_slots] + self.rest_time
+            self.occupy_counter[rows] += count_match
+
+        self.call_state[rows] = call_state
+        self.update_next_event(rows)
+
+    def update_next_event(self, rows: np.ndarray):
+        """Time of the nearest call event or end of oper rest for rows, occupy runs only for rows with due events"""
+        call_state = self.call_state[rows]
+
+        # every call slot waits for one event: search of oper, hotline or end of talk
+        event_time = np.where(call_state == CALL_RING, self.call_search[rows],
+                              np.where(call_state == CALL_WAIT, self.call_redirect[rows],
+                                       np.where(call_state == CALL_TALK, self.call_end[rows], np.inf)))
+        oper_rest_end = self.oper_rest_end[rows]
+        rest_end = np.where(self.oper_exists[rows] & (oper_rest_end >= self.current_time), oper_rest_end, np.inf)
+        self.next_event[rows] = np.minimum(event_time.min(axis=1, initial=np.inf), rest_end.min(axis=1, initial=np.inf))
+
+    def run_step(self):
+        now = self.current_time
+        epsilon = self.step / 1000
+        self.count_steps += 1
+
+        booster_rows = np.nonzero(~self.finished & (self.next_booster <= now + epsilon))[0]
+        if booster_rows.size:
+            self.run_booster(booster_rows)
+
+        chart_rows = np.nonzero(~self.finished & (self.next_chart <= now + epsilon))[0]
+        if chart_rows.size:
+            self.run_chart(chart_rows)
+
+        occupy_rows = np.nonzero(self.next_event < now)[0]
+        if occupy_rows.size:
+            self.run_occupy_and_release(occupy_rows)
+
+        self.step_number = self.get_next_step_number()
+        self.current_time = round(self.step_number * self.step, 6)
+
+    def get_next_step_number(self) -> int:
+        """
+        Skip the steps where nothing is due in any row, the same as DemoSkillUnit.next_occupy_time
+
+        The next step is not later than the nearest booster, chart sample, call event or end of oper rest,
+        a step found too early by rounding only does nothing
+        """
+        active = ~self.finished
+        if not active.any():
+            return self.step_number + 1
+
+        next_time = min(self.next_booster[active].min() - self.step / 1000,
+                        self.next_chart[active].min() - self.step / 1000,
+                        self.next_event.min())
+        return max(self.step_number + 1, math.floor(next_time / self.step))
+
+    def get_stats(self) -> list[dict]:
+        """The same stats as DemoSkillUnit.get_stats for every row"""
+        avg_busy = np.round(self.sum_busy / np.maximum(self.count_busy, 1), 3)
+        return [{
+            "kp": row['kp'],
+            "ki": row['ki'],
+            "kd": row['kd'],
+            "update_time": row['update_time'],
+            "call_counter": int(self.call_counter[number]),
+            "hotline_counter": int(self.hotline_counter[number]),
+            "occupy_counter": int(self.occupy_counter[number]),
+            "avg_busy": float(avg_busy[number])
+        } for number, row in enumerate(self.params)]
+
+    def run_simulation(self) -> list[dict]:
+        """
+        Run steps until every row is finished
+
+        @return stats of every row, the same order as params
+        """
+        self.log.info(f'start rows={len(self.params)} step={self.step}')
+        while not self.finished.all():
+            self.run_step()
+
+        self.log.info(f'end steps={self.count_steps} call_slots={self.call_state.shape[1]}')
+        return self.get_stats()
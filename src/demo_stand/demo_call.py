@@ -1,32 +1,35 @@
-from datetime import datetime
 from typing import Optional
 
 from loguru import logger
 
-from src.config import Config
-
 
 class DemoCall(object):
+    __slots__ = ('skill_id', 'call_id', 'date_call', 'date_answer', 'redirect_search', 'redirect_call',
+                 'redirect_answer', 'date_end', 'oper_id')
+
     def __init__(self,
-                 config: Config,
                  skill_id: int,
                  call_id: int,
-                 date_call: datetime,
-                 date_answer: datetime,
-                 redirect_search: datetime,
-                 redirect_call: datetime,
-                 redirect_answer: datetime,
-                 date_end: datetime):
-        self.config: Config = config
+                 date_call: float,
+                 date_answer: float,
+                 redirect_search: float,
+                 redirect_call: float,
+                 redirect_answer: float,
+                 date_end: float):
         self.skill_id: int = skill_id
         self.call_id: int = call_id
 
-        self.date_call: datetime = date_call
-        self.date_answer: datetime = date_answer
-        self.redirect_search: datetime = redirect_search
-        self.redirect_call: datetime = redirect_call
-        self.redirect_answer: datetime = redirect_answer
-        self.date_end: datetime = date_end
+        # seconds from the start of DemoSkillUnit.clock
+        self.date_call: float = date_call
+        self.date_answer: float = date_answer
+        self.redirect_search: float = redirect_search
+        self.redirect_call: float = redirect_call
+        self.redirect_answer: float = redirect_answer
+        self.date_end: float = date_end
 
         self.oper_id: Optional[int] = None
-        self.log = logger.bind(object_id=f'{self.__class__.__name__}-{call_id}')
+
+    @property
+    def log(self):
+        """Bound logger is created only when somebody writes a log, demo calls are too many to keep it"""
+        return logger.bind(object_id=f'{self.__class__.__name__}-{self.call_id}')
@@ -0,0 +1,31 @@
+import time
+from datetime import datetime, timedelta
+
+
+class DemoClock(object):
+    """Wall clock for the demo stand, time() is seconds since the clock was created"""
+
+    def __init__(self):
+        self.start_date: datetime = datetime.now()
+        self.start_monotonic: float = time.monotonic()
+
+    def time(self) -> float:
+        return time.monotonic() - self.start_monotonic
+
+    def now(self) -> datetime:
+        return self.start_date + timedelta(seconds=self.time())
+
+
+class VirtualClock(DemoClock):
+    """Simulated clock, time moves only when the simulation calls advance_to"""
+
+    def __init__(self):
+        super().__init__()
+        self.current_time: float = 0.0
+
+    def time(self) -> float:
+        return self.current_time
+
+    def advance_to(self, new_time: float):
+        if new_time > self.current_time:
+            self.current_time = new_time
@@ -1,23 +1,24 @@
-from datetime import datetime
 from typing import Optional
 
 from loguru import logger
 
-from src.config import Config
-
 
 class DemoOper(object):
+    __slots__ = ('skill_id', 'oper_id', 'rest_time', 'rest_end', 'date_end', 'call_id')
+
     def __init__(self,
-                 config: Config,
                  skill_id: int,
                  oper_id: int,
                  rest_time: int = 20,
                  ):
-        self.config: Config = config
         self.skill_id: int = skill_id
         self.oper_id: int = oper_id
         self.rest_time: int = rest_time
-        self.rest_end: datetime = datetime(2010, 1, 1)
+        self.rest_end: float = 0.0  # seconds from the start of DemoSkillUnit.clock
+        self.date_end: float = 0.0
         self.call_id: Optional[int] = None
 
-        self.log = logger.bind(object_id=f'{self.__class__.__name__}-{oper_id}')
+    @property
+    def log(self):
+        """Bound logger is created only when somebody writes a log"""
+        return logger.bind(object_id=f'{self.__class__.__name__}-{self.oper_id}')
@@ -1,6 +1,6 @@
 import asyncio
-import random
-from datetime import datetime, timedelta
+import heapq
+import math
 from typing import Optional
 
 import numpy as np
@@ -9,7 +9,9 @@ from simple_pid import PID
 
 from src.config import Config
 from src.demo_stand.demo_call import DemoCall
+from src.demo_stand.demo_clock import DemoClock, VirtualClock
 from src.demo_stand.demo_oper import DemoOper
+from src.demo_stand.skill_chart_replay import SkillChartReplay, SkillChartRow
 
 
 class DemoSkillUnit(object):
@@ -23,7 +25,12 @@ class DemoSkillUnit(object):
                  ki: float,
                  kd: float,
                  min_oper_power: float,
-                 max_oper_power: float
+                 max_oper_power: float,
+                 duration: int = 120,
+                 virtual_time: bool = False,
+                 replay: Optional[SkillChartReplay] = None,
+                 replay_load_share: float = 0.0,
+                 seed: Optional[int] = None
                  ):
         self.config: Config = config
         self.skill_id: int = skill_id
@@ -35,6 +42,21 @@ class DemoSkillUnit(object):
         self.kd: float = kd
         self.min_oper_power: float = min_oper_power
         self.max_oper_power: float = max_oper_power
+        self.duration: int = duration  # minutes
+        self.virtual_time: bool = virtual_time  # if true then run on VirtualClock without asyncio.sleep
+        self.clock: DemoClock = VirtualClock() if virtual_time else DemoClock()
+        self.occupy_tick: float = 0.1
+        self.chart_tick: int = 5
+        self.replay: Optional[SkillChartReplay] = replay  # opers online and load from skill_chart, only virtual_time
+        self.replay_load_share: float = replay_load_share  # share of recorded cnt_busy held by traffic outside demo
+        self.replay_over: bool = False
+
+        # separate streams, so runs with the same seed get the same ratios per cycle and the same n-th call
+        ratio_seed, call_seed, delay_seed = np.random.SeedSequence(seed).spawn(3)
+        self.seed: Optional[int] = seed
+        self.ratio_rng: np.random.Generator = np.random.default_rng(ratio_seed)
+        self.call_rng: np.random.Generator = np.random.default_rng(call_seed)
+        self.delay_rng: np.random.Generator = np.random.default_rng(delay_seed)
 
         self.active: bool = True
         self.pid_disabled: bool = False
@@ -44,8 +66,8 @@ class DemoSkillUnit(object):
         self.approximate_busy: float = 0
         self.current_wait: int = 0
         self.agr_sum_wait: int = 0
-        self.start_time = datetime.now()
-        self.last_time = datetime.now()
+        self.start_time = self.clock.now()
+        self.last_time = self.clock.now()
         self.active_demo_calls: dict[int, DemoCall] = {}
         self.online_demo_opers: dict[int, DemoOper] = {}
         self.sequence_call_id: int = 1000
@@ -53,9 +75,17 @@ class DemoSkillUnit(object):
         self.occupy_counter: int = 0
         self.call_counter: int = 0
         self.call_wait_oper: set = set()
+        self.wait_queue: list[int] = []  # heap of call_id from call_wait_oper, the oldest call takes an oper first
+        self.call_events: list[tuple[float, int, str]] = []  # heap of (event_time, call_id, event_name)
+        self.rest_events: list[tuple[float, int]] = []  # heap of (rest_end, oper_id)
+        self.ready_opers: list[tuple[int, int]] = []  # heap of (rest_time, oper_id) for free and rested opers
+        self.held_opers: set[int] = set()  # opers busy with the replayed load, not in ready_opers
+        self.count_logout: int = 0  # busy opers who go offline at the end of their rest
+        self.sequence_oper_id: int = 0
         self.history_current_busy = []
+        self.last_hotline_counter: int = 0
 
-        self.pid = PID(Kp=self.kp, Ki=self.ki, Kd=self.kd, setpoint=self.current_online)
+        self.pid = PID(Kp=self.kp, Ki=self.ki, Kd=self.kd, setpoint=self.current_online, time_fn=self.clock.time)
 
         self.pid.output_limits = (self.min_oper_power * self.current_online, self.max_oper_power * self.current_online)
         self.pid.setpoint = round(self.current_online * self.wanted_ratio, 2)
@@ -70,14 +100,16 @@ class DemoSkillUnit(object):
             self.active = active
             self.log.info(f'new active = {active} for skill_id={self.skill_id}')
 
-    async def run_demo_calls(self) -> None:
+    def run_demo_calls(self) -> None:
+        # drawn every cycle, even without power, to keep ratio_rng in step between runs
+        answer_noise, redirect_noise = self.ratio_rng.standard_normal(2).tolist()
         if self.current_power <= 0:
             return
 
         self.call_counter += int(self.current_power * self.update_time)
 
-        answer_ratio = max(float(np.random.normal(loc=0.6, scale=0.05)), 0)
-        redirect_ratio = max(float(np.random.normal(loc=0.005, scale=0.002)), 0)
+        answer_ratio = max(0.6 + 0.05 * answer_noise, 0)
+        redirect_ratio = max(0.005 + 0.002 * redirect_noise, 0)
         batch_size = int(self.current_power * self.update_time * answer_ratio * redirect_ratio)
 
         if self.config.demo_log:
@@ -87,162 +119,373 @@ class DemoSkillUnit(object):
         if batch_size <= 0:
             return
 
-        for _ in range(batch_size):
+        # all timelines of the batch in seconds of self.clock, one row of noise per call
+        noise = self.call_rng.standard_normal((batch_size, 4))
+        date_call = self.clock.time() + np.round(self.delay_rng.random(batch_size) * self.update_time, 3)
+        ring_duration = np.maximum(16.5 + 3 * noise[:, 0], 6)
+        ivr_duration = np.maximum(31 + noise[:, 1], 6)
+        redirect_duration = np.maximum((80 + 15 * noise[:, 2]) * (1.2 + 0.25 * noise[:, 3]), 2)
+
+        date_answer = date_call + ring_duration
+        redirect_search = date_answer + ivr_duration
+        redirect_call = redirect_search + 3
+        redirect_answer = redirect_call + 1
+        date_end = redirect_answer + redirect_duration
+
+        for timeline in zip(date_call.tolist(), date_answer.tolist(), redirect_search.tolist(),
+                            redirect_call.tolist(), redirect_answer.tolist(), date_end.tolist()):
             call_id = self.generate_call_id()
-            delay = round(random.uniform(0, self.update_time), 3)
-            ring_duration = max(float(np.random.normal(loc=16.5, scale=3)), 6)
-            ivr_duration = max(float(np.random.normal(loc=31, scale=1)), 6)
-            redirect_duration = float(np.random.normal(loc=80, scale=15) * np.random.normal(loc=1.2, scale=0.25))
-            redirect_duration = max(redirect_duration, 2)
-
-            date_call: datetime = datetime.now() + timedelta(seconds=delay)
-            date_answer: datetime = date_call + timedelta(seconds=ring_duration)
-            redirect_search: datetime = date_answer + timedelta(seconds=ivr_duration)
-            redirect_call: datetime = redirect_search + timedelta(seconds=3)
-            redirect_answer: datetime = redirect_call + timedelta(seconds=1)
-            date_end: datetime = redirect_answer + timedelta(seconds=redirect_duration)
 
             if self.config.demo_log:
-                self.log.info(f"new call: call_id={call_id} date_call={date_call} date_answer={date_answer} "
-                              f"redirect_search={redirect_search} redirect_call={redirect_call} "
-                              f"redirect_answer={redirect_answer} date_end={date_end}")
+                self.log.info(f"new call: call_id={call_id} date_call={timeline[0]} date_answer={timeline[1]} "
+                              f"redirect_search={timeline[2]} redirect_call={timeline[3]} "
+                              f"redirect_answer={timeline[4]} date_end={timeline[5]}")
 
-            new_demo_call = DemoCall(config=self.config,
-                                     skill_id=self.skill_id,
+            new_demo_call = DemoCall(skill_id=self.skill_id,
                                      call_id=call_id,
-                                     date_call=date_call,
-                                     date_answer=date_answer,
-                                     redirect_search=redirect_search,
-                                     redirect_call=redirect_call,
-                                     redirect_answer=redirect_answer,
-                                     date_end=date_end)
+                                     date_call=timeline[0],
+                                     date_answer=timeline[1],
+                                     redirect_search=timeline[2],
+                                     redirect_call=timeline[3],
+                                     redirect_answer=timeline[4],
+                                     date_end=timeline[5])
             self.active_demo_calls[call_id] = new_demo_call
+            heapq.heappush(self.call_events, (timeline[2], call_id, 'search'))
+
+    def update_skill_chart(self):
+        self.refresh_busy_stats()
+        self.history_current_busy.append(self.current_busy)
 
     async def background_update_skill_chart(self):
         while self.config.wait_shutdown is False:
-            await asyncio.sleep(5)
-            self.history_current_busy.append(self.current_busy)
-
-    async def occupy_oper(self, call_id: int, date_end: datetime) -> Optional[int]:
-        order_online_demo_opers = [oper for oper in sorted(self.online_demo_opers.values(), key=lambda x: x.rest_time)]
+            await asyncio.sleep(self.chart_tick)
+            self.update_skill_chart()
 
-        for oper in order_online_demo_opers:
-            if oper.call_id is None and (oper.rest_end is None or datetime.now() > oper.rest_end):
-                oper.call_id = call_id
-                oper.date_end = date_end
-                oper.rest_end = date_end + timedelta(seconds=oper.rest_time)
-                self.occupy_counter += 1
-                return oper.oper_id
+    def pop_ready_oper(self) -> Optional[int]:
+        """The free oper with the shortest rest_time, opers who went offline are skipped"""
+        while self.ready_opers:
+            _, oper_id = heapq.heappop(self.ready_opers)
+            if oper_id in self.online_demo_opers:
+                return oper_id
 
         return None
 
-    async def background_occupy_and_release_oper(self):
-        while self.config.wait_shutdown is False:
-            await asyncio.sleep(0.1)
-            calls_for_remove = []
-            for demo_call in self.active_demo_calls.values():
-                if datetime.now() > demo_call.date_end:
-                    # call ended
+    def occupy_oper(self, call_id: int, date_end: float) -> Optional[int]:
+        """Take the free oper with the shortest rest_time, he returns to ready_opers after rest_end"""
+        oper_id = self.pop_ready_oper()
+        if oper_id is None:
+            return None
+
+        oper = self.online_demo_opers[oper_id]
+        oper.call_id = call_id
+        oper.date_end = date_end
+        oper.rest_end = date_end + oper.rest_time
+        heapq.heappush(self.rest_events, (oper.rest_end, oper_id))
+        self.occupy_counter += 1
+        return oper_id
+
+    def occupy_wait_calls(self):
+        """Give free opers to the waiting calls until opers or calls run out"""
+        while self.wait_queue:
+            call_id = self.wait_queue[0]
+            if call_id not in self.call_wait_oper:
+                # already transferred to hotline
+                heapq.heappop(self.wait_queue)
+                continue
+
+            demo_call = self.active_demo_calls[call_id]
+            demo_call.oper_id = self.occupy_oper(call_id=call_id, date_end=demo_call.date_end)
+            if demo_call.oper_id is None:
+                # no free opers left
+                break
+
+            heapq.heappop(self.wait_queue)
+            self.call_wait_oper.discard(call_id)
+            heapq.heappush(self.call_events, (demo_call.date_end, call_id, 'end'))
+            if self.config.demo_log:
+                self.log.info(f"occupy oper_id={demo_call.oper_id} with call_id={call_id}")
+
+    def occupy_and_release_oper(self):
+        """Handle only the call events and oper rests that are due by now"""
+        now = self.clock.time()
+        search_oper = False
+
+        while self.call_events and self.call_events[0][0] < now:
+            _, call_id, event_name = heapq.heappop(self.call_events)
+            demo_call = self.active_demo_calls.get(call_id)
+            if demo_call is None:
+                continue
+
+            if event_name == 'end':
+                # call ended
+                if self.config.demo_log:
+                    self.log.info(f'Call with call_id={call_id} ended')
+                self.active_demo_calls.pop(call_id)
+                if demo_call.oper_id in self.online_demo_opers:
+                    self.online_demo_opers[demo_call.oper_id].call_id = None
                     if self.config.demo_log:
-                        self.log.info(f'Call with call_id={demo_call.call_id} ended')
-                    calls_for_remove.append(demo_call.call_id)
-                    if demo_call.oper_id in self.online_demo_opers:
-                        self.online_demo_opers[demo_call.oper_id].call_id = None
-                        if self.config.demo_log:
-                            self.log.info(f"release oper_id={demo_call.oper_id} call_id={demo_call.oper_id} ")
-                elif demo_call.oper_id is None and datetime.now() > demo_call.redirect_call:
+                        self.log.info(f"release oper_id={demo_call.oper_id} call_id={call_id} ")
+            elif event_name == 'hotline':
+                if demo_call.oper_id is None:
                     # transfer to hotline
                     if self.config.demo_log:
-                        self.log.info(f"For call with call_id={demo_call.call_id} not found free oper during this time")
-                    calls_for_remove.append(demo_call.call_id)
-                    self.call_wait_oper.discard(demo_call.call_id)
+                        self.log.info(f"For call with call_id={call_id} not found free oper during this time")
+                    self.active_demo_calls.pop(call_id)
+                    self.call_wait_oper.discard(call_id)
                     self.hotline_counter += 1
-                elif demo_call.oper_id is None and datetime.now() > demo_call.redirect_search:
-                    # search free oper
-                    demo_call.oper_id = await self.occupy_oper(call_id=demo_call.call_id,
-                                                               date_end=demo_call.date_end)
-                    if demo_call.oper_id:
-                        self.call_wait_oper.discard(demo_call.call_id)
-                        if self.config.demo_log:
-                            self.log.info(f"occupy oper_id={demo_call.oper_id} with call_id={demo_call.call_id}")
-                    else:
-                        # This call is waiting for some oper to be released
-                        self.call_wait_oper.add(demo_call.call_id)
-
-            for call_id in calls_for_remove:
-                self.active_demo_calls.pop(call_id)
-
-            current_busy = 0
-            approximate_busy = 0
-            for oper in self.online_demo_opers.values():
-                if oper.call_id in self.active_demo_calls:
-                    call = self.active_demo_calls[oper.call_id]
-                    dialog_second = (datetime.now() - call.redirect_call).total_seconds()
-                    current_busy += 1
-                    approximate_busy += 1 if dialog_second < 60 else 0.9
-                elif datetime.now() < oper.rest_end:
-                    current_busy += 1
-                    approximate_busy += (oper.rest_end - datetime.now()).total_seconds() / oper.rest_time * 0.6
-
-            self.current_busy = current_busy
-            self.approximate_busy = approximate_busy
-            self.current_wait = len(self.call_wait_oper)
-
-    async def start_booster(self):
-        """Booster for start_call"""
+            else:
+                # search free oper, this call is waiting for some oper until redirect_call
+                self.call_wait_oper.add(call_id)
+                heapq.heappush(self.wait_queue, call_id)
+                heapq.heappush(self.call_events, (demo_call.redirect_call, call_id, 'hotline'))
+                search_oper = True
+
+        while self.rest_events and self.rest_events[0][0] < now:
+            _, oper_id = heapq.heappop(self.rest_events)
+            if self.count_logout > 0:
+                self.count_logout -= 1
+                self.online_demo_opers.pop(oper_id)
+                continue
+            heapq.heappush(self.ready_opers, (self.online_demo_opers[oper_id].rest_time, oper_id))
+            search_oper = True
+
+        if search_oper:
+            self.occupy_wait_calls()
+
+        self.current_wait = len(self.call_wait_oper)
+
+    def refresh_busy_stats(self):
+        now = self.clock.time()
+        current_busy = 0
+        approximate_busy = 0
+        for oper in self.online_demo_opers.values():
+            if oper.call_id in self.active_demo_calls:
+                call = self.active_demo_calls[oper.call_id]
+                dialog_second = now - call.redirect_call
+                current_busy += 1
+                approximate_busy += 1 if dialog_second < 60 else 0.9
+            elif oper.oper_id in self.held_opers:
+                current_busy += 1
+                approximate_busy += 1
+            elif now < oper.rest_end:
+                current_busy += 1
+                approximate_busy += (oper.rest_end - now) / oper.rest_time * 0.6
+
+        self.current_busy = current_busy
+        self.approximate_busy = approximate_busy
 
+    async def background_occupy_and_release_oper(self):
+        while self.config.wait_shutdown is False:
+            await asyncio.sleep(self.occupy_tick)
+            self.occupy_and_release_oper()
+
+    def add_oper(self):
+        self.sequence_oper_id += 1
+        oper_id = self.sequence_oper_id
+        self.online_demo_opers[oper_id] = DemoOper(skill_id=self.skill_id,
+                                                   oper_id=oper_id,
+                                                   rest_time=20)
+        heapq.heappush(self.ready_opers, (self.online_demo_opers[oper_id].rest_time, oper_id))
+
+    def create_opers(self):
         if self.config.demo_log:
             self.log.info(f'Create oper for current_online={self.current_online}')
 
-        for oper_id in range(1, self.current_online + 1):
-            self.online_demo_opers[oper_id] = DemoOper(config=self.config,
-                                                       skill_id=self.skill_id,
-                                                       oper_id=oper_id,
-                                                       rest_time=20)
+        for _ in range(self.current_online):
+            self.add_oper()
+
+    def set_online_opers(self, cnt_online: int):
+        """Free opers log in and out at once, busy opers log out at the end of their rest"""
+        diff = cnt_online - (len(self.online_demo_opers) - self.count_logout)
+        if diff > 0:
+            cancel_logout = min(diff, self.count_logout)
+            self.count_logout -= cancel_logout
+            for _ in range(diff - cancel_logout):
+                self.add_oper()
+
+        while diff < 0:
+            oper_id = self.pop_ready_oper()
+            if oper_id is None and self.held_opers:
+                oper_id = self.held_opers.pop()
+            if oper_id is None:
+                self.count_logout -= diff
+                break
+            self.online_demo_opers.pop(oper_id)
+            diff += 1
+
+        self.current_online = cnt_online
+        self.pid.output_limits = (self.min_oper_power * self.current_online, self.max_oper_power * self.current_online)
+        self.pid.setpoint = round(self.current_online * self.wanted_ratio, 2)
+
+    def set_held_opers(self, count: int):
+        """Free opers are held by the replayed load until it goes down"""
+        while len(self.held_opers) > count:
+            oper_id = self.held_opers.pop()
+            heapq.heappush(self.ready_opers, (self.online_demo_opers[oper_id].rest_time, oper_id))
 
-        asyncio.create_task(self.background_update_skill_chart())
-        asyncio.create_task(self.background_occupy_and_release_oper())
+        while len(self.held_opers) < count:
+            oper_id = self.pop_ready_oper()
+            if oper_id is None:
+                break
+            self.held_opers.add(oper_id)
 
-        last_hotline_counter = 0
+    def apply_skill_chart_row(self, row: SkillChartRow):
+        if self.config.demo_log:
+            self.log.info(f'replay row={row}')
+
+        self.set_online_opers(row.cnt_online)
+        self.set_held_opers(round(row.cnt_busy * self.replay_load_share))
+        self.occupy_wait_calls()
+
+    def get_stats(self) -> dict:
+        avg_busy = 0
+        if self.history_current_busy:
+            avg_busy = round(sum(self.history_current_busy) / len(self.history_current_busy), 3)
+
+        return {
+            "kp": self.kp,
+            "ki": self.ki,
+            "kd": self.kd,
+            "update_time": self.update_time,
+            "call_counter": self.call_counter,
+            "hotline_counter": self.hotline_counter,
+            "occupy_counter": self.occupy_counter,
+            "avg_busy": avg_busy
+        }
+
+    def save_stats(self):
+        stats = self.get_stats()
+        with open("pid_params_stats.txt", 'a', encoding='utf-8') as txt_file:
+            row = f"{stats['kp']};{stats['ki']};{stats['kd']};{stats['update_time']};{stats['call_counter']};" \
+                  f"{stats['hotline_counter']};{stats['occupy_counter']};{stats['avg_busy']}\n"
+            txt_file.write(row)
+
+    def booster_step(self) -> bool:
+        """
+        One cycle of the booster: new power from PID and new demo calls
+
+        @return False if the demo is over
+        """
+        if self.active is False or self.pid_disabled is True:
+            self.pid.reset()
+            self.current_power = 0
+            return True
+
+        self.refresh_busy_stats()
+        diff_hotline_counter = self.hotline_counter - self.last_hotline_counter
+        self.last_hotline_counter = self.hotline_counter
+
+        feedback = round(self.approximate_busy + self.current_wait + diff_hotline_counter, 3)
+        self.current_power = round(self.pid(feedback), 3)
+
+        if self.config.demo_log:
+            current_stats = {
+                "online": self.current_online,
+                "approximate_busy": self.approximate_busy,
+                "busy": self.current_busy,
+                "wait": self.current_wait,
+                "count_call": len(self.active_demo_calls),
+                "hotline_counter": self.hotline_counter,
+                "occupy_counter": self.occupy_counter,
+                "call_counter": self.call_counter,
+                "power": self.current_power,
+                "feedback": feedback,
+            }
+            self.log.info(f"current_stats={current_stats}")
+
+        if self.clock.time() > self.duration * 60 or self.replay_over:
+            return False
+
+        self.run_demo_calls()
+        return True
+
+    def next_occupy_time(self, next_booster_time: float) -> float:
+        """
+        Skip the occupy ticks where nothing is due, the next tick is the first one after the nearest event
+
+        Only booster_step adds new calls, so we never jump over the next booster
+        """
+        next_time = next_booster_time
+        if self.call_events:
+            next_time = min(next_time, self.call_events[0][0])
+        if self.rest_events:
+            next_time = min(next_time, self.rest_events[0][0])
+
+        tick_number = max(math.floor(next_time / self.occupy_tick) + 1, round(self.clock.time() / self.occupy_tick) + 1)
+        return tick_number * self.occupy_tick
+
+    def run_simulation(self) -> dict:
+        """
+        Run the whole demo on VirtualClock: the event queue jumps from one tick to the next without sleeping
+
+        With replay the opers online follow skill_chart rows and the demo ends with the last row
+
+        @return stats of the demo
+        """
+        # (event_time, order for equal time, event_name)
+        events: list[tuple[float, int, str]] = [(0.0, 0, 'booster'),
+                                                (self.chart_tick, 1, 'chart'),
+                                                (self.occupy_tick, 2, 'occupy')]
+
+        replay_rows = self.replay.iter_rows() if self.replay else iter(())
+        replay_row: Optional[SkillChartRow] = next(replay_rows, None)
+        if replay_row:
+            events.append((replay_row.offset, -1, 'replay'))
+            heapq.heapify(events)
+        elif self.replay:
+            self.log.warning('skill_chart is empty for replay')
+            self.replay_over = True
+        else:
+            self.create_opers()
+
+        next_booster_time = 0.0
 
         while self.config.wait_shutdown is False:
-            try:
-                if self.active is False or self.pid_disabled is True:
-                    self.pid.reset()
-                    self.current_power = 0
-                    await asyncio.sleep(1)
+            event_time, order, event_name = heapq.heappop(events)
+            self.clock.advance_to(event_time)
+
+            if event_name == 'replay':
+                self.apply_skill_chart_row(replay_row)
+                replay_row = next(replay_rows, None)
+                if replay_row is None:
+                    self.replay_over = True
                     continue
+                next_time = replay_row.offset
+            elif event_name == 'booster':
+                if self.booster_step() is False:
+                    break
+                next_time = next_booster_time = event_time + self.update_time
+            elif event_name == 'chart':
+                self.update_skill_chart()
+                next_time = event_time + self.chart_tick
+            else:
+                self.occupy_and_release_oper()
+                next_time = self.next_occupy_time(next_booster_time)
+
+            heapq.heappush(events, (round(next_time, 6), order, event_name))
+
+        if self.replay:
+            replay_rows.close()
+        return self.get_stats()
+
+    async def start_booster(self):
+        """Booster for start_call"""
 
-                diff_hotline_counter = self.hotline_counter - last_hotline_counter
-                last_hotline_counter = self.hotline_counter
+        if self.virtual_time:
+            self.run_simulation()
+            self.save_stats()
+            return
 
-                feedback = round(self.approximate_busy + self.current_wait + diff_hotline_counter, 3)
-                self.current_power = round(self.pid(feedback), 3)
+        self.create_opers()
 
-                if self.config.demo_log:
-                    current_stats = {
-                        "online": self.current_online,
-                        "approximate_busy": self.approximate_busy,
-                        "busy": self.current_busy,
-                        "wait": self.current_wait,
-                        "count_call": len(self.active_demo_calls),
-                        "hotline_counter": self.hotline_counter,
-                        "occupy_counter": self.occupy_counter,
-                        "call_counter": self.call_counter,
-                        "power": self.current_power,
-                        "feedback": feedback,
-                    }
-                    self.log.info(f"current_stats={current_stats}")
-
-                if datetime.now() > self.start_time + timedelta(minutes=120):
-                    with open("pid_params_stats.txt", 'a', encoding='utf-8') as txt_file:
-                        avg_busy = round(sum(self.history_current_busy) / len(self.history_current_busy), 3)
-                        row = f"{self.kp};{self.ki};{self.kd};{self.update_time};{self.call_counter};" \
-                              f"{self.hotline_counter};{self.occupy_counter};{avg_busy}\n"
-                        txt_file.write(row)
-                        break
-
-                await self.run_demo_calls()
+        asyncio.create_task(self.background_update_skill_chart())
+        asyncio.create_task(self.background_occupy_and_release_oper())
+
+        while self.config.wait_shutdown is False:
+            try:
+                if self.booster_step() is False:
+                    self.save_stats()
+                    break
             except Exception as e:
                 self.log.exception(e)
             except KeyboardInterrupt:
@@ -0,0 +1,134 @@
+import argparse
+import random
+import sys
+
+from loguru import logger
+
+from src.config import Config
+from src.demo_stand.run_sweep import expand_grid, load_grid, run_combinations
+from src.demo_stand.sweep_store import ENGINE_BATCH, ENGINE_EXACT, SweepStore
+
+
+def score_stats(stats: dict, params: dict, hotline_weight: float = 1.0) -> float:
+    """
+    Higher is better: share of busy opers minus weighted share of transfers lost to the hotline
+
+    @param stats: Result of DemoSkillUnit.get_stats
+    @param params: Params of this run
+    @param hotline_weight: Price of one lost transfer relative to the share of busy opers
+    @return score
+    """
+    transfers = stats['occupy_counter'] + stats['hotline_counter']
+    hotline_share = stats['hotline_counter'] / transfers if transfers else 0
+    return stats['avg_busy'] / params['oper_online'] - hotline_weight * hotline_share
+
+
+def get_rung_durations(min_duration: int, max_duration: int, eta: int) -> list[int]:
+    durations = [min_duration]
+    while durations[-1] * eta < max_duration:
+        durations.append(durations[-1] * eta)
+    if durations[-1] != max_duration:
+        durations.append(max_duration)
+    return durations
+
+
+def successive_halving(config: Config,
+                       candidates: list[dict],
+                       store: SweepStore,
+                       min_duration: int = 15,
+                       max_duration: int = 120,
+                       eta: int = 3,
+                       hotline_weight: float = 1.0,
+                       workers: int = 0,
+                       batch_size: int = 0) -> list[tuple[float, dict]]:
+    """
+    Run all candidates on a short horizon, keep the best 1/eta and run them again on a eta times longer horizon
+
+    Results of every rung go to store, so a restarted search does not run them again
+
+    @param config: Config for DemoSkillUnit
+    @param candidates: Params for DemoSkillUnit without duration
+    @param store: Every finished run is saved here
+    @param min_duration: Horizon of the first rung in minutes
+    @param max_duration: Horizon of the last rung in minutes
+    @param eta: Only 1/eta of candidates go to the next rung
+    @param hotline_weight: See score_stats
+    @param workers: Count of processes, 0 - one process per core
+    @param batch_size: Count of candidates in one BatchDemoSimulator, 0 - one DemoSkillUnit per candidate
+    @return (score, params) of the last rung, the best is first
+    """
+    survivors = candidates
+    scored: list[tuple[float, dict]] = []
+    used_minutes = 0
+
+    for rung, duration in enumerate(get_rung_durations(min_duration, max_duration, eta)):
+        if rung > 0:
+            survivors = [params for _, params in scored[:max(1, len(scored) // eta)]]
+
+        rung_params = [dict(params, duration=duration) for params in survivors]
+        done_results = store.get_done_results()
+        todo = [params for params in rung_params if store.get_key(params) not in done_results]
+        logger.info(f'rung={rung} duration={duration} candidates={len(rung_params)} new_runs={len(todo)}')
+        run_combinations(config=config, combinations=todo, store=store, workers=workers, batch_size=batch_size)
+        used_minutes += duration * len(rung_params)
+
+        done_results = store.get_done_results()
+        scored = [(score_stats(done_results[store.get_key(params)], params, hotline_weight), params)
+                  for params in rung_params if store.get_key(params) in done_results]
+        scored.sort(key=lambda x: x[0], reverse=True)
+        if scored:
+            logger.info(f'rung={rung} best score={round(scored[0][0], 4)} params={scored[0][1]}')
+
+    full_minutes = max_duration * len(candidates)
+    logger.info(f'simulated {used_minutes} minutes instead of {full_minutes} for the full grid '
+                f'({round(used_minutes / full_minutes * 100, 1) if full_minutes else 0}%)')
+    return scored
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Successive halving search of DemoSkillUnit params')
+    parser.add_argument('--grid', default='', help='json file with lists of params, see DEFAULT_GRID')
+    parser.add_argument('--candidates', type=int, default=0, help='random sample from the grid, default all')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the sample of candidates')
+    parser.add_argument('--min-duration', type=int, default=15, help='minutes of the first rung')
+    parser.add_argument('--max-duration', type=int, default=120, help='minutes of the last rung')
+    parser.add_argument('--eta', type=int, default=3, help='only 1/eta of candidates go to the next rung')
+    parser.add_argument('--hotline-weight', type=float, default=1.0, help='price of the hotline share in score')
+    parser.add_argument('--workers', type=int, default=0, help='count of processes, default one per core')
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help='candidates in one approximate BatchDemoSimulator, it is faster from about 1000, '
+                             'results are saved apart from DemoSkillUnit, default one DemoSkillUnit per candidate')
+    parser.add_argument('--db', default='demo_stand_sweep.db', help='SQLite file with results, used for resume')
+    args = parser.parse_args()
+
+    cfg: Config = Config()
+    cfg.demo_log = False
+    logger.configure(extra={"object_id": "None"})  # Default values if not bind extra variable
+    logger.remove()  # this removes duplicates in the console if we use custom log format
+    logger.add(sink=sys.stdout,
+               format=cfg.log_format,
+               colorize=True)
+
+    grid = load_grid(args.grid)
+    grid.pop('duration')
+    all_candidates = expand_grid(grid)
+    if 0 < args.candidates < len(all_candidates):
+        all_candidates = random.Random(args.seed).sample(all_candidates, args.candidates)
+
+    sweep_store = SweepStore(db_path=args.db, engine=ENGINE_BATCH if args.batch_size > 0 else ENGINE_EXACT)
+    try:
+        best = successive_halving(config=cfg,
+                                  candidates=all_candidates,
+                                  store=sweep_store,
+                                  min_duration=args.min_duration,
+                                  max_duration=args.max_duration,
+                                  eta=args.eta,
+                                  hotline_weight=args.hotline_weight,
+                                  workers=args.workers,
+                                  batch_size=args.batch_size)
+        for score, best_params in best[:5]:
+            logger.info(f'score={round(score, 4)} params={best_params}')
+    except KeyboardInterrupt:
+        logger.warning('KeyboardInterrupt')
+    finally:
+        sweep_store.close()
@@ -0,0 +1,58 @@
+import argparse
+import sys
+
+from loguru import logger
+
+from src.config import Config
+from src.demo_stand.demo_skill_unit import DemoSkillUnit
+from src.demo_stand.skill_chart_replay import SkillChartReplay
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run DemoSkillUnit against opers online recorded in skill_chart')
+    parser.add_argument('--db', default='chart_database.db', help='SQLite file of Manager with skill_chart')
+    parser.add_argument('--skill-id', type=int, required=True)
+    parser.add_argument('--date-start', default='', help='first calc_time in isoformat, default the first row')
+    parser.add_argument('--date-end', default='', help='last calc_time in isoformat, default the last row')
+    parser.add_argument('--load-share', type=float, default=0.0,
+                        help='share of recorded cnt_busy held by traffic outside of demo calls')
+    parser.add_argument('--update-time', type=int, default=15)
+    parser.add_argument('--wanted-ratio', type=float, default=0.85)
+    parser.add_argument('--kp', type=float, default=2.5)
+    parser.add_argument('--ki', type=float, default=0.003)
+    parser.add_argument('--kd', type=float, default=0.0001)
+    parser.add_argument('--min-oper-power', type=float, default=0.0)
+    parser.add_argument('--max-oper-power', type=float, default=1000.0)
+    parser.add_argument('--demo-log', action='store_true', help='detailed logs of every call')
+    args = parser.parse_args()
+
+    cfg: Config = Config()
+    cfg.demo_log = args.demo_log
+    logger.configure(extra={"object_id": "None"})  # Default values if not bind extra variable
+    logger.remove()  # this removes duplicates in the console if we use custom log format
+    logger.add(sink=sys.stdout,
+               format=cfg.log_format,
+               colorize=True)
+
+    skill_chart_replay = SkillChartReplay(db_path=args.db,
+                                          skill_id=args.skill_id,
+                                          date_start=args.date_start,
+                                          date_end=args.date_end)
+
+    demo_skill_unit = DemoSkillUnit(config=cfg,
+                                    skill_id=args.skill_id,
+                                    update_time=args.update_time,
+                                    oper_online=0,
+                                    wanted_ratio=args.wanted_ratio,
+                                    kp=args.kp,
+                                    ki=args.ki,
+                                    kd=args.kd,
+                                    min_oper_power=args.min_oper_power,
+                                    max_oper_power=args.max_oper_power,
+                                    duration=10 ** 9,  # until the end of replay
+                                    virtual_time=True,
+                                    replay=skill_chart_replay,
+                                    replay_load_share=args.load_share)
+    try:
+        logger.info(f'stats={demo_skill_unit.run_simulation()}')
+    except KeyboardInterrupt:
+        logger.warning('KeyboardInterrupt')
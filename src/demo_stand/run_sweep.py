@@ -0,0 +1,278 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from loguru import logger
+
+from src.config import Config
+from src.demo_stand.batch_simulator import BatchDemoSimulator
+from src.demo_stand.demo_skill_unit import DemoSkillUnit
+from src.demo_stand.sweep_store import ENGINE_BATCH, ENGINE_EXACT, SweepStore
+
+# every value is a list, the sweep runs the Cartesian product of all lists
+# the grid without derivative (kp 2.2..3.1, kd 0) is in config/sweep_grid_pi.json.example
+DEFAULT_GRID = {
+    "kp": [2.5 + x * 0.1 for x in range(0, 5)],
+    "ki": [0.001, 0.002, 0.003],
+    "kd": [0.0001 + x * 0.0001 for x in range(0, 10)],
+    "update_time": [15, 21, 43, 60],
+    "oper_online": [20],
+    "wanted_ratio": [0.85],
+    "min_oper_power": [0.0],
+    "max_oper_power": [1000.0],
+    "duration": [120],
+    "seed": [0]  # the same seed gives every combination the same calls, see DemoSkillUnit.seed
+}
+
+
+def load_grid(grid_path: str = '') -> dict:
+    """
+    Read grid from json file, missing keys are taken from DEFAULT_GRID
+
+    @param grid_path: File path with grid
+    @return grid
+    """
+    grid = DEFAULT_GRID.copy()
+    if grid_path:
+        with open(grid_path, "r") as jsonfile:
+            grid.update(json.load(jsonfile))
+
+    unknown = set(grid) - set(DEFAULT_GRID)
+    if unknown:
+        raise ValueError(f'unknown grid params: {unknown}')
+
+    return grid
+
+
+def expand_grid(grid: dict) -> list[dict]:
+    names = list(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def run_demo_skill_unit(config: Config, skill_id: int, params: dict) -> list[dict]:
+    """Worker for the process pool: one DemoSkillUnit on the virtual clock"""
+    demo_skill_unit = DemoSkillUnit(config=config,
+                                    skill_id=skill_id,
+                                    virtual_time=True,
+                                    **params)
+    return [demo_skill_unit.run_simulation()]
+
+
+def run_batch_demo_simulator(params: list[dict]) -> list[dict]:
+    """Worker for the process pool: many param sets in one BatchDemoSimulator"""
+    return BatchDemoSimulator(params=params).run_simulation()
+
+
+def run_combinations(config: Config,
+                     combinations: list[dict],
+                     store: SweepStore,
+                     workers: int = 0,
+                     batch_size: int = 0) -> list[dict]:
+    """
+    Run combinations across the process pool and save every finished run in store
+
+    @param config: Config for DemoSkillUnit
+    @param combinations: Params for DemoSkillUnit
+    @param store: Every finished run is saved here
+    @param workers: Count of processes, 0 - one process per core
+    @param batch_size: Count of combinations in one BatchDemoSimulator, 0 - one DemoSkillUnit per combination
+    @return stats of finished runs, the same order as combinations, None for failed runs
+    """
+    if (batch_size > 0) != (store.engine == ENGINE_BATCH):
+        raise ValueError(f'batch_size={batch_size} does not match engine={store.engine} of store')
+
+    workers = workers or os.cpu_count() or 1
+    results: list[dict | None] = [None] * len(combinations)
+    count_done = 0
+    start_time = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if batch_size > 0:
+            futures = {executor.submit(run_batch_demo_simulator, combinations[first:first + batch_size]):
+                       range(first, min(first + batch_size, len(combinations)))
+                       for first in range(0, len(combinations), batch_size)}
+        else:
+            futures = {executor.submit(run_demo_skill_unit, config, 1000 + number, params): range(number, number + 1)
+                       for number, params in enumerate(combinations)}
+
+        for future in as_completed(futures):
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                logger.exception(e)
+                continue
+
+            for number, stats in zip(futures[future], chunk_results):
+                results[number] = stats
+                store.add(params=combinations[number], stats=stats)
+                count_done += 1
+
+            spent_minutes = (time.monotonic() - start_time) / 60
+            runs_per_minute = round(count_done / spent_minutes, 2) if spent_minutes > 0 else 0
+            left_minutes = round((len(combinations) - count_done) / runs_per_minute, 1) if runs_per_minute else 0
+            logger.info(f'done {count_done}/{len(combinations)} runs_per_minute={runs_per_minute} '
+                        f'left_minutes={left_minutes} last={chunk_results[-1]}')
+
+    store.flush()
+    logger.info(f'{count_done} runs ended in {round(time.monotonic() - start_time, 1)} seconds')
+    return results
+
+
+def run_sweep(config: Config, grid: dict, store: SweepStore, workers: int = 0, batch_size: int = 0) -> list[dict]:
+    """
+    Run all combinations from grid across the process pool, combinations already in store are skipped
+
+    @param config: Config for DemoSkillUnit
+    @param grid: Params for DemoSkillUnit, see DEFAULT_GRID
+    @param store: Every finished run is saved here
+    @param workers: Count of processes, 0 - one process per core
+    @param batch_size: Count of combinations in one BatchDemoSimulator, 0 - one DemoSkillUnit per combination
+    @return stats of runs from this start
+    """
+    done_keys = store.get_done_keys()
+    combinations = [params for params in expand_grid(grid) if store.get_key(params) not in done_keys]
+    logger.info(f'Start sweep: runs={len(combinations)} already_done={len(done_keys)} workers={workers}')
+
+    return [stats for stats in run_combinations(config, combinations, store, workers, batch_size) if stats]
+
+
+# two-sided 95% Student t for df = 1..30, after that the normal value 1.96 is used
+T_95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+
+def get_confidence_interval(values: list[float]) -> tuple[float, float]:
+    """
+    Mean and half-width of 95% confidence interval
+
+    @param values: One value per replication
+    @return (mean, half_width), half_width is inf for less than two values
+    """
+    count = len(values)
+    mean = sum(values) / count if count else 0.0
+    if count < 2:
+        return mean, float('inf')
+
+    variance = sum((value - mean) ** 2 for value in values) / (count - 1)
+    t_value = T_95[count - 2] if count - 2 < len(T_95) else 1.96
+    return mean, t_value * (variance / count) ** 0.5
+
+
+def run_replicated(config: Config,
+                   grid: dict,
+                   store: SweepStore,
+                   workers: int = 0,
+                   batch_size: int = 0,
+                   min_replications: int = 3,
+                   max_replications: int = 20,
+                   precision: float = 0.05) -> list[dict]:
+    """
+    Run every combination with seeds 0, 1, 2... until 95% confidence intervals of avg_busy and hotline_counter
+    are tight enough or max_replications is reached
+
+    Seed k gives every combination the same calls, so the difference between combinations is measured
+    on the same random scenarios. Every replication is saved in store, a restarted run continues from it
+
+    @param config: Config for DemoSkillUnit
+    @param grid: Params for DemoSkillUnit, seed from grid is ignored
+    @param store: Every finished run is saved here
+    @param workers: Count of processes, 0 - one process per core
+    @param batch_size: Count of runs in one BatchDemoSimulator, 0 - one DemoSkillUnit per run
+    @param min_replications: Replications of every combination before the first check
+    @param max_replications: Combination stops here even if the interval is wide
+    @param precision: Wanted half-width relative to the mean (hotline_counter has a floor of one call)
+    @return summary per combination: params, replications, mean and half-width of avg_busy and hotline_counter
+    """
+    min_replications = max(2, min_replications)
+    max_replications = max(min_replications, max_replications)
+    combinations = expand_grid(dict(grid, seed=[0]))
+    replications = [min_replications] * len(combinations)
+    active = set(range(len(combinations)))
+    summaries: list[dict | None] = [None] * len(combinations)
+
+    while active:
+        done_results = store.get_done_results()
+        todo = [dict(combinations[number], seed=seed)
+                for number in sorted(active)
+                for seed in range(replications[number])]
+        todo = [params for params in todo if store.get_key(params) not in done_results]
+        logger.info(f'replication round: combinations={len(active)} new_runs={len(todo)}')
+        run_combinations(config=config, combinations=todo, store=store, workers=workers, batch_size=batch_size)
+
+        done_results = store.get_done_results()
+        for number in sorted(active):
+            runs = [done_results.get(store.get_key(dict(combinations[number], seed=seed)))
+                    for seed in range(replications[number])]
+            runs = [stats for stats in runs if stats]
+            busy_mean, busy_half = get_confidence_interval([stats['avg_busy'] for stats in runs])
+            hotline_mean, hotline_half = get_confidence_interval([stats['hotline_counter'] for stats in runs])
+            summaries[number] = dict(combinations[number],
+                                     replications=len(runs),
+                                     avg_busy=round(busy_mean, 4),
+                                     avg_busy_ci=round(busy_half, 4),
+                                     hotline_counter=round(hotline_mean, 2),
+                                     hotline_counter_ci=round(hotline_half, 2))
+
+            tight = (busy_half <= precision * abs(busy_mean)
+                     and hotline_half <= max(precision * hotline_mean, 1.0))
+            if tight or replications[number] >= max_replications:
+                active.discard(number)
+            else:
+                # grow by half, so the pool gets enough runs in one round
+                replications[number] = min(max_replications,
+                                           replications[number] + max(1, replications[number] // 2))
+
+    for summary in summaries:
+        summary.pop('seed')
+        logger.info(f'replicated: {summary}')
+    return summaries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sweep DemoSkillUnit params on all cores')
+    parser.add_argument('--grid', default='', help='json file with lists of params, see DEFAULT_GRID')
+    parser.add_argument('--workers', type=int, default=0, help='count of processes, default one per core')
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help='combinations in one approximate BatchDemoSimulator, it is faster from about 1000, '
+                             'results are saved apart from DemoSkillUnit, default one DemoSkillUnit per combination')
+    parser.add_argument('--db', default='demo_stand_sweep.db', help='SQLite file with results, used for resume')
+    parser.add_argument('--replications-min', type=int, default=0,
+                        help='replicate every combination with seeds 0, 1, 2... at least this count, default off')
+    parser.add_argument('--replications-max', type=int, default=20, help='upper limit of replications')
+    parser.add_argument('--precision', type=float, default=0.05,
+                        help='wanted half-width of 95%% confidence interval relative to the mean')
+    args = parser.parse_args()
+
+    cfg: Config = Config()
+    cfg.demo_log = False
+    logger.configure(extra={"object_id": "None"})  # Default values if not bind extra variable
+    logger.remove()  # this removes duplicates in the console if we use custom log format
+    logger.add(sink=sys.stdout,
+               format=cfg.log_format,
+               colorize=True)
+
+    sweep_store = SweepStore(db_path=args.db, engine=ENGINE_BATCH if args.batch_size > 0 else ENGINE_EXACT)
+    try:
+        if args.replications_min > 0:
+            run_replicated(config=cfg,
+                           grid=load_grid(args.grid),
+                           store=sweep_store,
+                           workers=args.workers,
+                           batch_size=args.batch_size,
+                           min_replications=args.replications_min,
+                           max_replications=args.replications_max,
+                           precision=args.precision)
+        else:
+            run_sweep(config=cfg,
+                      grid=load_grid(args.grid),
+                      store=sweep_store,
+                      workers=args.workers,
+                      batch_size=args.batch_size)
+    except KeyboardInterrupt:
+        logger.warning('KeyboardInterrupt')
+    finally:
+        sweep_store.close()
@@ -0,0 +1,78 @@
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, Optional
+
+from loguru import logger
+
+
+@dataclass
+class SkillChartRow(object):
+    offset: float  # seconds from the first row of the replay
+    cnt_online: int
+    cnt_busy: int
+    cnt_wait_oper: int
+    power: Optional[int]
+
+
+class SkillChartReplay(object):
+    """Stream of skill_chart rows recorded by Manager, read in small batches so long histories fit in memory"""
+
+    def __init__(self,
+                 db_path: str,
+                 skill_id: int,
+                 date_start: str = '',
+                 date_end: str = '',
+                 fetch_size: int = 1000):
+        """
+        @param db_path: File path of chart_database.db
+        @param skill_id: Skill from skill_chart
+        @param date_start: First calc_time in isoformat, empty - from the first row
+        @param date_end: calc_time in isoformat where the replay stops, empty - until the last row
+        @param fetch_size: Count of rows in one read from SQLite
+        """
+        self.db_path: str = db_path
+        self.skill_id: int = skill_id
+        self.date_start: str = date_start
+        self.date_end: str = date_end
+        self.fetch_size: int = fetch_size
+        self.log = logger.bind(object_id=f'{self.__class__.__name__}-{skill_id}')
+
+    def iter_rows(self) -> Iterator[SkillChartRow]:
+        sql = ('SELECT calc_time, cnt_online, cnt_busy, cnt_wait_oper, power '
+               'FROM skill_chart '
+               'WHERE skill_id = ? ')
+        params: list = [self.skill_id]
+        if self.date_start:
+            sql += 'AND calc_time >= ? '
+            params.append(self.date_start)
+        if self.date_end:
+            sql += 'AND calc_time < ? '
+            params.append(self.date_end)
+        sql += 'ORDER BY calc_time'
+
+        sqlite_connector = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+        try:
+            cursor = sqlite_connector.cursor()
+            cursor.execute(sql, params)
+            first_time: Optional[datetime] = None
+            count_rows = 0
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+
+                for calc_time, cnt_online, cnt_busy, cnt_wait_oper, power in rows:
+                    row_time = datetime.fromisoformat(calc_time)
+                    if first_time is None:
+                        first_time = row_time
+                    count_rows += 1
+                    yield SkillChartRow(offset=(row_time - first_time).total_seconds(),
+                                        cnt_online=cnt_online,
+                                        cnt_busy=cnt_busy,
+                                        cnt_wait_oper=cnt_wait_oper,
+                                        power=power)
+
+            self.log.info(f'end of replay, rows={count_rows} first_time={first_time}')
+        finally:
+            sqlite_connector.close()
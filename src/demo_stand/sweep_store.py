@@ -0,0 +1,113 @@
+import sqlite3
+
+from loguru import logger
+
+
+# engine of the run: DemoSkillUnit.run_simulation or the approximate BatchDemoSimulator
+ENGINE_EXACT = 'exact'
+ENGINE_BATCH = 'batch'
+
+
+class SweepStore(object):
+    """
+    Results of the sweep in SQLite, one row per combination of params, seed and engine
+    Results of one engine are never taken for another one
+    """
+
+    param_columns = ('kp', 'ki', 'kd', 'update_time', 'oper_online', 'wanted_ratio',
+                     'min_oper_power', 'max_oper_power', 'duration', 'seed')
+    stat_columns = ('call_counter', 'hotline_counter', 'occupy_counter', 'avg_busy')
+
+    def __init__(self, db_path: str, batch_size: int = 20, engine: str = ENGINE_EXACT):
+        """
+        Open (or create) the results table
+
+        @param db_path: File path of SQLite database
+        @param batch_size: Count of results in one transaction
+        @param engine: ENGINE_EXACT or ENGINE_BATCH, results of this store are read and saved only for it
+        """
+        self.db_path: str = db_path
+        self.engine: str = engine
+        self.batch_size: int = batch_size
+        self.pending_rows: list[tuple] = []
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+        self.sqlite_connector = sqlite3.connect(db_path)
+        cursor = self.sqlite_connector.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sweep_stats (
+        kp REAL NOT NULL,
+        ki REAL NOT NULL,
+        kd REAL NOT NULL,
+        update_time INTEGER NOT NULL,
+        oper_online INTEGER NOT NULL,
+        wanted_ratio REAL NOT NULL,
+        min_oper_power REAL NOT NULL,
+        max_oper_power REAL NOT NULL,
+        duration INTEGER NOT NULL,
+        seed INTEGER NOT NULL DEFAULT -1,
+        call_counter INTEGER NOT NULL,
+        hotline_counter INTEGER NOT NULL,
+        occupy_counter INTEGER NOT NULL,
+        avg_busy REAL NOT NULL,
+        engine TEXT NOT NULL DEFAULT 'exact',
+        calc_time TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # results saved before seeds were added get seed = -1
+        # and results saved before engines were added are from DemoSkillUnit
+        cursor.execute('PRAGMA table_info(sweep_stats)')
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'seed' not in columns:
+            cursor.execute('ALTER TABLE sweep_stats ADD COLUMN seed INTEGER NOT NULL DEFAULT -1')
+        if 'engine' not in columns:
+            cursor.execute(f"ALTER TABLE sweep_stats ADD COLUMN engine TEXT NOT NULL DEFAULT '{ENGINE_EXACT}'")
+        cursor.execute('DROP INDEX IF EXISTS sweep_stats_params')
+        cursor.execute('DROP INDEX IF EXISTS sweep_stats_params_seed')
+
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS sweep_stats_params_seed_engine '
+                       f'ON sweep_stats ({", ".join(self.param_columns)}, engine)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS sweep_stats_avg_busy ON sweep_stats (avg_busy)')
+        self.sqlite_connector.commit()
+
+    def get_key(self, params: dict) -> tuple:
+        return tuple(params[column] for column in self.param_columns)
+
+    def get_done_keys(self) -> set[tuple]:
+        cursor = self.sqlite_connector.cursor()
+        cursor.execute(f'SELECT {", ".join(self.param_columns)} FROM sweep_stats WHERE engine = ?', (self.engine,))
+        return set(cursor.fetchall())
+
+    def get_done_results(self) -> dict[tuple, dict]:
+        """Stats of all saved runs by key of params"""
+        cursor = self.sqlite_connector.cursor()
+        cursor.execute(f'SELECT {", ".join(self.param_columns + self.stat_columns)} FROM sweep_stats '
+                       f'WHERE engine = ?', (self.engine,))
+        results = {}
+        for row in cursor.fetchall():
+            key = row[:len(self.param_columns)]
+            results[key] = dict(zip(self.param_columns + self.stat_columns, row))
+        return results
+
+    def add(self, params: dict, stats: dict):
+        self.pending_rows.append(self.get_key(params) + tuple(stats[column] for column in self.stat_columns) +
+                                 (self.engine,))
+        if len(self.pending_rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_rows:
+            return
+
+        columns = self.param_columns + self.stat_columns + ('engine',)
+        with self.sqlite_connector:
+            self.sqlite_connector.executemany(f'INSERT OR REPLACE INTO sweep_stats ({", ".join(columns)}) '
+                                              f'VALUES ({", ".join("?" * len(columns))})',
+                                              self.pending_rows)
+        self.log.info(f'saved {len(self.pending_rows)} results of {self.engine} in {self.db_path}')
+        self.pending_rows.clear()
+
+    def close(self):
+        self.flush()
+        self.sqlite_connector.close()
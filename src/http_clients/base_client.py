@@ -1,19 +1,20 @@
 import asyncio
 import time
-from json import JSONDecodeError
 from typing import Optional
 
-from aiohttp import client, BasicAuth
+from aiohttp import BasicAuth
 from loguru import logger
 
 from src.custom_dataclasses.api_request import ApiRequest
 from src.custom_dataclasses.api_response import ApiResponse
+from src.http_clients.connection_pool import ConnectionPool
+from src.json_codec import JSONDecodeError, dumps, loads
 
 
 class BaseClient(object):
 
-    def __init__(self, auth: Optional[BasicAuth] = None):
-        self.client_session = client.ClientSession(auth=auth)
+    def __init__(self, connection_pool: ConnectionPool, auth: Optional[BasicAuth] = None):
+        self.client_session = connection_pool.create_session(auth=auth)
         self.log = logger.bind(object_id=self.__class__.__name__)
         self.count_request = 0
 
@@ -32,6 +33,12 @@ class BaseClient(object):
                                                 message='',
                                                 result=None)
 
+        # body is encoded once for all attempts
+        data, headers = None, api_request.headers
+        if api_request.request is not None:
+            data = dumps(api_request.request)
+            headers = {**api_request.headers, 'Content-Type': 'application/json'}
+
         for attempt in range(0, api_request.attempts):
             api_response.used_attempts = attempt
             if attempt > 0 or api_request.debug_log:
@@ -39,15 +46,17 @@ class BaseClient(object):
             try:
                 async with self.client_session.request(method=api_request.method,
                                                        url=api_request.url,
-                                                       json=api_request.request,
-                                                       headers=api_request.headers,
-                                                       timeout=api_request.timeout) as response:
+                                                       data=data,
+                                                       headers=headers,
+                                                       timeout=api_request.timeout or self.client_session.timeout
+                                                       ) as response:
                     api_response.http_code = response.status
                     api_response.content_type = response.content_type
                     api_response.execute_time = time.time() - start_time
                     api_response.message = f'http_code {response.status}'
                     try:
-                        api_response.result = await response.json(content_type=None)
+                        body = (await response.read()).strip()
+                        api_response.result = loads(body) if body else None
 
                         if api_response.result is None:
                             api_response.result = {"res": "OK", "msg": "response is None"}
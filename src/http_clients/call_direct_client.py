@@ -1,4 +1,5 @@
 import asyncio
+from typing import Optional
 
 from loguru import logger
 
@@ -6,13 +7,15 @@ from src.config import Config
 from src.custom_dataclasses.api_request import ApiRequest
 from src.custom_dataclasses.api_response import ApiResponse
 from src.http_clients.base_client import BaseClient
+from src.http_clients.connection_pool import ConnectionPool
 
 
 class CallDirectClient(BaseClient):
-    def __init__(self, config: Config, api_url: str):
-        super().__init__()
+    def __init__(self, config: Config, connection_pool: ConnectionPool, api_url: str):
+        super().__init__(connection_pool=connection_pool)
         self.config = config
         self.api_url: str = api_url
+        self.batch_supported: bool = True  # False after CallDirect answered that it has no /call/start_batch
         self.log = logger.bind(object_id=f'{self.__class__.__name__}#{self.api_url}')
         self.log.info(f"create new client_session: {self.client_session}")
 
@@ -33,3 +36,39 @@ class CallDirectClient(BaseClient):
         api_response: ApiResponse = await self.send(api_request)
 
         return api_response.success
+
+    async def start_calls(self,
+                          leads: list[dict],
+                          offsets: list[float]) -> Optional[list[bool]]:
+        """
+        Start many calls in one request, CallDirect starts every call after its offset
+
+        @param leads: Leads from DbBuffer
+        @param offsets: Seconds from now for every lead
+        @return success of every lead, None if CallDirect has no batch endpoint
+        """
+        if self.batch_supported is False:
+            return None
+
+        if self.config.mock_api_request:
+            await asyncio.sleep(0.2)
+            self.log.info(f'offsets={offsets} leads={leads}')
+            return [True] * len(leads)
+
+        api_request = ApiRequest(url=f'{self.api_url}/call/start_batch',
+                                 method='POST',
+                                 request={"calls": [{"lead": lead, "offset": offset}
+                                                    for lead, offset in zip(leads, offsets)]})
+
+        api_response: ApiResponse = await self.send(api_request)
+
+        if api_response.http_code in (404, 405, 501):
+            self.log.warning(f'batch is not supported, http_code={api_response.http_code}, use single calls')
+            self.batch_supported = False
+            return None
+
+        results = api_response.result.get('results') if isinstance(api_response.result, dict) else None
+        if api_response.success and isinstance(results, list) and len(results) == len(leads):
+            return [bool(result.get('success')) for result in results]
+        else:
+            return [False] * len(leads)
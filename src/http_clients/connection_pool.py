@@ -0,0 +1,103 @@
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, TraceConfig
+from loguru import logger
+
+from src.config import Config
+
+
+class ConnectionPool(object):
+    """
+    One TCPConnector for sessions of all clients: common limits, keep-alive connections and cache of DNS
+    TCP_NODELAY is set by aiohttp on every new connection
+    """
+
+    def __init__(self, config: Config):
+        self.config: Config = config
+        self.connector: Optional[TCPConnector] = None
+        self.timeout: ClientTimeout = ClientTimeout(total=config.http_total_timeout or None,
+                                                    sock_connect=config.http_connect_timeout or None)
+        self.count_created: int = 0
+        self.count_reused: int = 0
+        self.count_queued: int = 0
+        self.wait_time: float = 0  # sum of waiting time for a free connection
+        self.max_wait_time: float = 0
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+        self.trace_config = TraceConfig()
+        self.trace_config.on_connection_create_end.append(self.on_connection_create_end)
+        self.trace_config.on_connection_reuseconn.append(self.on_connection_reuseconn)
+        self.trace_config.on_connection_queued_start.append(self.on_connection_queued_start)
+        self.trace_config.on_connection_queued_end.append(self.on_connection_queued_end)
+
+    def get_connector(self) -> TCPConnector:
+        if self.connector is None or self.connector.closed:
+            self.connector = TCPConnector(limit=self.config.http_limit,
+                                          limit_per_host=self.config.http_limit_per_host,
+                                          keepalive_timeout=self.config.http_keepalive_timeout,
+                                          use_dns_cache=self.config.http_ttl_dns_cache > 0,
+                                          ttl_dns_cache=self.config.http_ttl_dns_cache or None)
+            self.log.info(f'new connector: limit={self.config.http_limit} '
+                          f'limit_per_host={self.config.http_limit_per_host}')
+            self.check_limits()
+        return self.connector
+
+    def check_limits(self):
+        """Calls in flight of CallPacer must fit in the pool, otherwise they wait for connections and time out"""
+        max_in_flight = self.config.call_direct_max_in_flight
+        total_in_flight = max_in_flight * len(self.config.call_direct_addresses)
+        if 0 < self.config.http_limit_per_host < max_in_flight:
+            self.log.warning(f'http_limit_per_host={self.config.http_limit_per_host} is less than '
+                             f'call_direct_max_in_flight={max_in_flight}')
+        if 0 < self.config.http_limit <= total_in_flight:
+            self.log.warning(f'http_limit={self.config.http_limit} leaves no headroom above {total_in_flight} '
+                             f'calls in flight of all CallDirect nodes')
+
+    def create_session(self, **kwargs) -> ClientSession:
+        """Session on the shared connector, closing of session does not close the connector"""
+        return ClientSession(connector=self.get_connector(),
+                             connector_owner=False,
+                             timeout=self.timeout,
+                             trace_configs=[self.trace_config],
+                             **kwargs)
+
+    async def on_connection_create_end(self, session, context, params):
+        self.count_created += 1
+
+    async def on_connection_reuseconn(self, session, context, params):
+        self.count_reused += 1
+
+    async def on_connection_queued_start(self, session, context: SimpleNamespace, params):
+        self.count_queued += 1
+        context.queued_time = time.monotonic()
+
+    async def on_connection_queued_end(self, session, context: SimpleNamespace, params):
+        wait_time = time.monotonic() - context.queued_time
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def get_stats(self) -> dict:
+        # aiohttp has no public counters of connections in the pool
+        acquired = len(getattr(self.connector, '_acquired', ()))
+        idle = sum(len(conns) for conns in getattr(self.connector, '_conns', {}).values())
+        waiting = sum(len(waiters) for waiters in getattr(self.connector, '_waiters', {}).values())
+        return {
+            "limit": self.config.http_limit,
+            "limit_per_host": self.config.http_limit_per_host,
+            "open": acquired + idle,
+            "in_use": acquired,
+            "idle": idle,
+            "waiting": waiting,
+            "count_created": self.count_created,
+            "count_reused": self.count_reused,
+            "count_queued": self.count_queued,
+            "avg_wait_time": round(self.wait_time / self.count_queued, 4) if self.count_queued else 0,
+            "max_wait_time": round(self.max_wait_time, 4)
+        }
+
+    async def close(self):
+        if self.connector is not None and self.connector.closed is False:
+            self.log.info('close connector')
+            await self.connector.close()
@@ -6,11 +6,12 @@ from src.config import Config
 from src.custom_dataclasses.api_request import ApiRequest
 from src.custom_dataclasses.api_response import ApiResponse
 from src.http_clients.base_client import BaseClient
+from src.http_clients.connection_pool import ConnectionPool
 
 
 class DbBufferClient(BaseClient):
-    def __init__(self, config: Config):
-        super().__init__()
+    def __init__(self, config: Config, connection_pool: ConnectionPool):
+        super().__init__(connection_pool=connection_pool)
         self.config = config
         self.log = logger.bind(object_id=f'{self.__class__.__name__}#{self.api_url}')
         self.log.info(f"create new client_session: {self.client_session}")
@@ -41,3 +42,24 @@ class DbBufferClient(BaseClient):
             return api_response.result.get('leads')
         else:
             return []
+
+    async def return_leads(self, skill_id: int, leads: list[dict]) -> bool:
+        """
+        Leads that were taken and not dialed go back to DbBuffer
+
+        @param skill_id: Skill of leads
+        @param leads: Leads from get_leads
+        @return True if DbBuffer took them
+        """
+        if self.config.mock_api_request:
+            await asyncio.sleep(0.2)
+            return True
+
+        api_request = ApiRequest(url=f'{self.api_url}/data/lead/return',
+                                 method='POST',
+                                 request={"skill_id": skill_id, "leads": leads},
+                                 correct_http_code={200, 201, 202, 204})
+
+        api_response: ApiResponse = await self.send(api_request)
+
+        return api_response.success
@@ -1,19 +1,27 @@
 import asyncio
 import random
-from typing import Optional
+import time
+from typing import Any, Awaitable, Callable, Optional
 
+from aiohttp import WSMsgType
 from loguru import logger
 
 from src.config import Config
 from src.custom_dataclasses.api_request import ApiRequest
 from src.custom_dataclasses.api_response import ApiResponse
 from src.http_clients.base_client import BaseClient
+from src.http_clients.connection_pool import ConnectionPool
+from src.json_codec import loads
 
 
 class OperDispatcherClient(BaseClient):
-    def __init__(self, config: Config):
-        super().__init__()
+    def __init__(self, config: Config, connection_pool: ConnectionPool):
+        super().__init__(connection_pool=connection_pool)
         self.config = config
+        self.in_flight: dict[str, asyncio.Future] = {}  # one request per resource, other callers await it
+        self.cached_results: dict[str, tuple[float, Any]] = {}  # resource => (monotonic time, result)
+        self.count_coalesced = 0
+        self.subscribed: bool = False  # True while the stream of skill details is open
         self.log = logger.bind(object_id=f'{self.__class__.__name__}#{self.api_url}')
         self.log.info(f"create new client_session: {self.client_session}")
 
@@ -21,7 +29,44 @@ class OperDispatcherClient(BaseClient):
     def api_url(self):
         return f'{self.config.oper_dispatcher_host}:{self.config.oper_dispatcher_port}'
 
+    async def single_flight(self, key: str, fetch: Callable[[], Awaitable]) -> Any:
+        """
+        Concurrent callers of the same resource share one request and its result
+        Successful result (not None) is served again for oper_dispatcher_cache_ttl seconds
+
+        @param key: Name of resource
+        @param fetch: Function for the request, returns None if the request failed
+        @return result of fetch
+        """
+        if key in self.cached_results:
+            result_time, result = self.cached_results[key]
+            if time.monotonic() - result_time <= self.config.oper_dispatcher_cache_ttl:
+                self.count_coalesced += 1
+                return result
+            del self.cached_results[key]
+
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self.in_flight[key] = future
+            future.add_done_callback(lambda done_future: self.end_flight(key, done_future))
+        else:
+            self.count_coalesced += 1
+
+        # shield: cancel of one caller must not cancel the request of others
+        return await asyncio.shield(future)
+
+    def end_flight(self, key: str, future: asyncio.Future):
+        self.in_flight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        if future.result() is not None and self.config.oper_dispatcher_cache_ttl > 0:
+            self.cached_results[key] = (time.monotonic(), future.result())
+
     async def get_active_skills(self) -> list[int]:
+        return await self.single_flight('active_skills', self.fetch_active_skills) or []
+
+    async def fetch_active_skills(self) -> Optional[list[int]]:
         if self.config.mock_api_request:
             await asyncio.sleep(0.2)
             active_skills = [1]
@@ -37,24 +82,52 @@ class OperDispatcherClient(BaseClient):
         if api_response.success:
             return api_response.result.get('active')
         else:
-            return []
+            return None
 
-    async def get_skill_details(self, skill_id: int) -> Optional[dict]:
+    @staticmethod
+    def get_mock_details() -> dict:
+        busy = random.randrange(0, 11)
+        wait = 0
+        if busy == 10:
+            wait = random.randrange(0, 5)
+
+        return {
+            "all": 100,
+            "online": 10,
+            "busy": busy,
+            "wait": wait
+        }
+
+    async def get_skills_details(self, skill_ids: list[int]) -> Optional[dict[int, dict]]:
+        """
+        Details of many skills in one request
+
+        @param skill_ids: Skills from OperDispatcher
+        @return details by skill_id, None if OperDispatcher has no batch endpoint or the request failed
+        """
         if self.config.mock_api_request:
             await asyncio.sleep(0.2)
-            busy = random.randrange(0, 11)
-            wait = 0
-            if busy == 10:
-                wait = random.randrange(0, 5)
+            return {skill_id: self.get_mock_details() for skill_id in skill_ids}
 
-            details = {
-                "all": 100,
-                "online": 10,
-                "busy": busy,
-                "wait": wait
-            }
+        api_request: ApiRequest = ApiRequest(url=f'{self.api_url}/skills_details',
+                                             method='POST',
+                                             request={"skill_ids": skill_ids},
+                                             debug_log=False)
+        api_response: ApiResponse = await self.send(api_request)
+
+        if api_response.success and isinstance(api_response.result, dict) and 'details' in api_response.result:
+            # json keys are always str
+            return {int(skill_id): details for skill_id, details in api_response.result['details'].items()}
+        else:
+            return None
+
+    async def get_skill_details(self, skill_id: int) -> Optional[dict]:
+        return await self.single_flight(f'skill_details/{skill_id}', lambda: self.fetch_skill_details(skill_id))
 
-            return details
+    async def fetch_skill_details(self, skill_id: int) -> Optional[dict]:
+        if self.config.mock_api_request:
+            await asyncio.sleep(0.2)
+            return self.get_mock_details()
 
         api_request: ApiRequest = ApiRequest(url=f'{self.api_url}/skill_details/{skill_id}',
                                              method='GET',
@@ -65,3 +138,44 @@ class OperDispatcherClient(BaseClient):
             return api_response.result.get('details')
         else:
             return None
+
+    async def subscribe_skill_details(self, on_details: Callable[[int, dict], None]):
+        """
+        Keep WebSocket /ws/skill_details open and call on_details for every change of skill
+        OperDispatcher sends {"skill_id": 1, "details": {"all": 100, "online": 10, "busy": 5, "wait": 0}}
+        The stream is opened again after errors, polling works while it is closed
+
+        @param on_details: Function(skill_id, details)
+        @return None
+        """
+        ws_url = f'{self.api_url}/ws/skill_details'
+        ws_url = ws_url.replace('http', 'ws', 1) if ws_url.startswith('http') else f'ws://{ws_url}'
+        reconnect_delay = 1
+        while self.config.wait_shutdown is False:
+            try:
+                if self.config.mock_api_request:
+                    self.subscribed = True
+                    while self.config.wait_shutdown is False:
+                        await asyncio.sleep(1)
+                        on_details(1, self.get_mock_details())
+                    break
+
+                async with self.client_session.ws_connect(ws_url, heartbeat=30) as ws:
+                    self.log.info(f'subscribed to {ws_url}')
+                    self.subscribed = True
+                    reconnect_delay = 1
+                    async for msg in ws:
+                        if msg.type != WSMsgType.TEXT:
+                            break
+                        message = loads(msg.data)
+                        on_details(int(message['skill_id']), message['details'])
+                self.log.warning(f'stream {ws_url} is closed')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log.warning(f'stream {ws_url} error: {e}')
+            finally:
+                self.subscribed = False
+
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, 60)
@@ -0,0 +1,30 @@
+"""
+Encoding and decoding of json for http clients, API and snapshot
+orjson is used if it is installed, otherwise the standard json module
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSONDecodeError = json.JSONDecodeError  # orjson.JSONDecodeError is a subclass of it
+
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+
+    def dumps(obj) -> bytes:
+        # keys of dict can be int like in the standard json, numpy values are used by PidBank
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    JSON_BACKEND = 'json'
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(data):
+        return json.loads(data)
@@ -0,0 +1,101 @@
+import asyncio
+from collections import deque
+from typing import Callable, Optional
+
+from loguru import logger
+
+from src.config import Config
+from src.http_clients.db_buffer_client import DbBufferClient
+
+
+class LeadBuffer(object):
+    """Leads of one skill in memory, refilled from DbBuffer in the background"""
+
+    def __init__(self, config: Config, skill_id: int, db_buffer_client: DbBufferClient):
+        self.config: Config = config
+        self.skill_id: int = skill_id
+        self.db_buffer_client: DbBufferClient = db_buffer_client
+        self.leads: deque[dict] = deque()
+        self.demand: int = 0  # leads for one cycle of SkillUnit
+        self.refill_event: asyncio.Event = asyncio.Event()
+        self.count_fetch: int = 0
+        self.last_batch_size: int = 0  # leads asked in the last request to DbBuffer
+        self.exhausted: bool = False  # the last request to DbBuffer found no leads
+        self.on_refill: Optional[Callable[[], None]] = None  # called when new leads are in the buffer
+        self.log = logger.bind(object_id=f'{self.__class__.__name__}-{skill_id}')
+
+    def __len__(self):
+        return len(self.leads)
+
+    @property
+    def low_watermark(self) -> int:
+        return int(self.demand * self.config.lead_buffer_low_cycles)
+
+    @property
+    def high_watermark(self) -> int:
+        return int(self.demand * self.config.lead_buffer_high_cycles)
+
+    def set_demand(self, demand: int):
+        """
+        Watermarks follow the demand, so the batch size adapts to the power of skill
+
+        @param demand: Leads for one cycle of SkillUnit
+        @return None
+        """
+        self.demand = max(0, demand)
+        if len(self.leads) < self.low_watermark:
+            self.refill_event.set()
+
+    def take(self, count: int) -> list[dict]:
+        """
+        Leads from memory without waiting for DbBuffer
+
+        @param count: Wanted count of leads
+        @return up to count leads
+        """
+        leads = [self.leads.popleft() for _ in range(min(count, len(self.leads)))]
+        if len(self.leads) < self.low_watermark:
+            self.refill_event.set()
+        return leads
+
+    async def refill(self) -> int:
+        """
+        Fill buffer up to high watermark, one request no more than lead_buffer_max_batch
+
+        @return count of new leads
+        """
+        batch_size = min(self.high_watermark - len(self.leads), self.config.lead_buffer_max_batch)
+        if batch_size <= 0:
+            return 0
+
+        self.count_fetch += 1
+        self.last_batch_size = batch_size
+        leads = await self.db_buffer_client.get_leads(batch_size=batch_size, skill_id=self.skill_id)
+        self.leads.extend(leads or [])
+        self.exhausted = not leads
+        if leads and self.on_refill:
+            self.on_refill()
+        return len(leads or [])
+
+    async def background_refill(self):
+        """
+        Refill only when set_demand or take wants leads, the task sleeps without timers while skill is idle
+        SkillSupervisor cancels the task when unit is removed or on shutdown
+
+        @return None
+        """
+        while self.config.wait_shutdown is False:
+            await self.refill_event.wait()
+            self.refill_event.clear()
+
+            try:
+                while self.config.wait_shutdown is False and len(self.leads) < self.low_watermark:
+                    count = await self.refill()
+                    if count < self.last_batch_size:
+                        # DbBuffer has no more leads now, the next request is not earlier than after the delay
+                        self.log.debug(f'found {count} of {self.last_batch_size} leads for skill_id={self.skill_id}')
+                        await asyncio.sleep(self.config.lead_buffer_empty_delay)
+                        break
+            except Exception as e:
+                self.log.exception(e)
+                await asyncio.sleep(self.config.lead_buffer_empty_delay)
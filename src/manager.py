@@ -1,14 +1,25 @@
 import asyncio
 import os
+import socket
 import sqlite3
+import time
+from typing import Optional
 
 from loguru import logger
 
+from src.call_pacer import CallPacer
 from src.config import Config
+from src.control_scheduler import ControlScheduler
 from src.http_clients.call_direct_client import CallDirectClient
+from src.http_clients.connection_pool import ConnectionPool
 from src.http_clients.db_buffer_client import DbBufferClient
 from src.http_clients.oper_dispatcher_client import OperDispatcherClient
+from src.pid_bank import PidBank
+from src.skill_details_cache import SkillDetailsCache
+from src.skill_lease_store import SkillLeaseStore
+from src.skill_supervisor import SkillSupervisor
 from src.skill_unit import SkillUnit
+from src.state_snapshot import StateSnapshot
 
 
 class Manager(object):
@@ -16,12 +27,39 @@ class Manager(object):
 
     def __init__(self, config: Config):
         self.config: Config = config
-        self.oper_dispatcher_client: OperDispatcherClient = OperDispatcherClient(config=config)
-        self.db_buffer_client: DbBufferClient = DbBufferClient(config=config)
+        self.connection_pool: ConnectionPool = ConnectionPool(config=config)
+        self.oper_dispatcher_client: OperDispatcherClient = OperDispatcherClient(config=config,
+                                                                                 connection_pool=self.connection_pool)
+        self.db_buffer_client: DbBufferClient = DbBufferClient(config=config, connection_pool=self.connection_pool)
         self.call_direct_clients: list[CallDirectClient] = []
+        self.call_pacer: CallPacer = CallPacer(config=config, call_direct_clients=self.call_direct_clients)
         self.log = logger.bind(object_id=self.__class__.__name__)
-        self.skill_units: dict[int, SkillUnit] = {}
+        self.skill_details_cache: SkillDetailsCache = SkillDetailsCache()
+        self.skill_supervisor: SkillSupervisor = SkillSupervisor(config=config,
+                                                                 create_skill_unit=self.create_skill_unit)
+        self.skill_units: dict[int, SkillUnit] = self.skill_supervisor.skill_units
+        self.batch_details_retry_time: float = 0  # monotonic time when the batch endpoint is tried again
         self.sqlite_connector = sqlite3.connect('chart_database.db', check_same_thread=False)
+        self.pid_bank: PidBank = PidBank()
+        self.control_scheduler: ControlScheduler = ControlScheduler(config=config,
+                                                                    skill_supervisor=self.skill_supervisor,
+                                                                    pid_bank=self.pid_bank,
+                                                                    sqlite_connector=self.sqlite_connector)
+        self.state_snapshot: Optional[StateSnapshot] = None
+        if config.state_snapshot_path:
+            self.state_snapshot = StateSnapshot(path=config.state_snapshot_path, max_age=config.state_snapshot_max_age)
+        self.restored_states: dict[int, dict] = {}  # state of skills from the previous process
+        self.leads_in_snapshot: bool = False  # drain saved leads for the next process, they are not returned
+        self.active_skills: list[int] = []  # the last answer of OperDispatcher
+        self.owned_skills: list[int] = []  # skills with a valid lease of this worker
+        self.lease_renew_time: float = 0  # monotonic time of the last renewal of leases
+        self.lease_lock: asyncio.Lock = asyncio.Lock()  # heartbeat and discovery loop share one SQLite connection
+        self.skill_lease_store: Optional[SkillLeaseStore] = None
+        if config.shard_db_path:
+            self.skill_lease_store = SkillLeaseStore(db_path=config.shard_db_path,
+                                                     worker_id=config.shard_worker_id or
+                                                     f'{socket.gethostname()}-{os.getpid()}',
+                                                     lease_time=config.shard_lease_time)
 
     def __del__(self):
         self.log.debug('object has died')
@@ -29,11 +67,16 @@ class Manager(object):
     async def close_session(self):
         if self.config.alive:
             self.log.info('start close_session')
+            await self.skill_supervisor.close(return_leads=not self.leads_in_snapshot)
+            if self.skill_lease_store:
+                async with self.lease_lock:
+                    self.skill_lease_store.close()
             self.sqlite_connector.close()
             await self.oper_dispatcher_client.close_session()
             await self.db_buffer_client.close_session()
             for call_direct_client in self.call_direct_clients:
                 await call_direct_client.close_session()
+            await self.connection_pool.close()
 
             self.config.wait_shutdown = True
             self.config.alive = True
@@ -58,6 +101,158 @@ class Manager(object):
 
         self.log.info('end alive report')
 
+    async def refresh_skill_details(self, skill_ids: list[int]):
+        """
+        Put details of skills in skill_details_cache, one request for all skills
+        If OperDispatcher has no batch endpoint, then one request per skill until batch_details_retry_time
+
+        @param skill_ids: Skills from OperDispatcher
+        @return None
+        """
+        if not skill_ids:
+            return
+
+        skills_details = None
+        if time.monotonic() >= self.batch_details_retry_time:
+            skills_details = await self.oper_dispatcher_client.get_skills_details(skill_ids=skill_ids)
+            if skills_details is None:
+                self.log.warning(f'batch skill details failed, use requests per skill '
+                                 f'for {self.config.skill_details_batch_retry_time} seconds')
+                self.batch_details_retry_time = time.monotonic() + self.config.skill_details_batch_retry_time
+
+        if skills_details is None:
+            results = await asyncio.gather(*[self.oper_dispatcher_client.get_skill_details(skill_id=skill_id)
+                                             for skill_id in skill_ids])
+            skills_details = dict(zip(skill_ids, results))
+
+        for skill_id, details in skills_details.items():
+            if details is not None:
+                self.skill_details_cache.update(skill_id=skill_id, details=details)
+
+    async def background_refresh_skill_details(self):
+        while self.config.wait_shutdown is False:
+            await asyncio.sleep(self.config.skill_details_refresh_time)
+            skill_ids = [skill_id for skill_id, skill_unit in self.skill_units.items() if skill_unit.active]
+            if self.oper_dispatcher_client.subscribed:
+                # the stream sends only changes, no news means details are actual
+                for skill_id in skill_ids:
+                    self.skill_details_cache.touch(skill_id=skill_id)
+                skill_ids = [skill_id for skill_id in skill_ids if skill_id not in self.skill_details_cache.details]
+
+            try:
+                await self.refresh_skill_details(skill_ids)
+            except Exception as e:
+                self.log.exception(e)
+
+    def on_skill_details(self, skill_id: int, details: dict):
+        """Change of skill from the stream of OperDispatcher"""
+        self.skill_details_cache.update(skill_id=skill_id, details=details)
+        if skill_id in self.skill_units:
+            self.skill_units[skill_id].apply_skill_details(details)
+
+    def create_skill_unit(self, skill_id: int) -> SkillUnit:
+        skill_unit = SkillUnit(config=self.config,
+                               oper_dispatcher_client=self.oper_dispatcher_client,
+                               db_buffer_client=self.db_buffer_client,
+                               call_pacer=self.call_pacer,
+                               sqlite_connector=self.sqlite_connector,
+                               skill_details_cache=self.skill_details_cache,
+                               pid_bank=self.pid_bank,
+                               skill_id=skill_id)
+        if skill_id in self.restored_states:
+            skill_unit.restore_state(self.restored_states.pop(skill_id))
+        return skill_unit
+
+    def save_snapshot(self, drained: bool = False):
+        # leads only after drain, without it they could be dialed by CallPacer after the snapshot
+        pending_leads = self.call_pacer.get_pending_leads() if drained else {}
+        skills = {}
+        for skill_id, skill_unit in self.skill_units.items():
+            skills[skill_id] = skill_unit.get_state(pending_leads.get(skill_id, []) if drained else None)
+        # shutdown before the first pass of active skills: restored states go to the next process as they are
+        for skill_id, state in self.restored_states.items():
+            skills.setdefault(skill_id, state)
+        self.state_snapshot.save(skills=skills, drained=drained)
+
+    async def background_save_snapshot(self):
+        while self.config.wait_shutdown is False:
+            await asyncio.sleep(self.config.state_snapshot_time)
+            if self.config.wait_shutdown is False:
+                try:
+                    self.save_snapshot()
+                except Exception as e:
+                    self.log.exception(e)
+
+    def return_restored_leads(self):
+        """
+        States of skills that are not dialed by this worker after the first pass of active skills:
+        the skill is inactive now or leased to another worker, so saved leads go back to DbBuffer
+
+        @return None
+        """
+        for skill_id, state in self.restored_states.items():
+            if state.get('leads'):
+                self.log.info(f'skill_id={skill_id} from snapshot is not dialed here, return its leads')
+                self.skill_supervisor.start_return_leads(self.db_buffer_client, skill_id, state['leads'])
+        self.restored_states.clear()
+
+    async def drain(self):
+        """
+        CallPacer does not start new calls after wait_shutdown, here we wait for answers of started calls
+        and save leads that were not dialed for the next process
+
+        @return None
+        """
+        if self.call_pacer.call_tasks:
+            await asyncio.wait(self.call_pacer.call_tasks, timeout=self.config.drain_timeout)
+
+        outstanding = sum(self.call_pacer.outstanding.values())
+        if outstanding:
+            self.log.warning(f'drain timeout, calls without answer: {outstanding}')
+        if self.state_snapshot:
+            self.save_snapshot(drained=True)
+            self.leads_in_snapshot = True
+
+    async def renew_leases(self):
+        """
+        Renew leases for the last active skills and dial only owned skills
+        SQLite can wait for the lock of other workers, so acquire runs in a thread and the event loop keeps pacing calls
+
+        If leases are not renewed for two thirds of shard_lease_time the worker stops dialing all skills,
+        so another worker that takes expired leases never dials the same skills at the same time
+
+        @return None
+        """
+        try:
+            async with self.lease_lock:
+                owned_skills = await asyncio.to_thread(self.skill_lease_store.acquire, self.active_skills)
+            self.lease_renew_time = time.monotonic()
+        except Exception as e:
+            self.log.exception(e)
+            if time.monotonic() - self.lease_renew_time < self.config.shard_lease_time * 2 / 3:
+                return
+            owned_skills = []
+            if self.owned_skills:
+                self.log.error(f'leases are not renewed for {round(time.monotonic() - self.lease_renew_time)} '
+                               f'seconds, stop skills {self.owned_skills}')
+
+        for skill_id in set(self.owned_skills) - set(owned_skills):
+            # other worker dials it now, leads that are not dialed yet go back to DbBuffer
+            self.skill_supervisor.release_leads(skill_id)
+        if owned_skills != self.owned_skills:
+            self.log.info(f"Skills of worker {self.skill_lease_store.worker_id} : {owned_skills}")
+        self.owned_skills = owned_skills
+
+        # other skills are dialed by other workers, here they are inactive
+        self.skill_supervisor.set_active_skills(owned_skills)
+
+    async def background_renew_leases(self):
+        """Heartbeat of leases does not wait for OperDispatcher, a hung request does not let leases expire"""
+        while self.config.wait_shutdown is False:
+            await asyncio.sleep(self.config.shard_lease_time / 3)
+            if self.config.wait_shutdown is False:
+                await self.renew_leases()
+
     async def start_manager(self):
         """
         Main function
@@ -65,7 +260,13 @@ class Manager(object):
         @return None
         """
         self.log.info('start_manager')
+        if self.state_snapshot:
+            self.restored_states = self.state_snapshot.load()
+            asyncio.create_task(self.background_save_snapshot())
         asyncio.create_task(self.alive_report())
+        asyncio.create_task(self.background_refresh_skill_details())
+        if self.config.oper_dispatcher_subscribe:
+            asyncio.create_task(self.oper_dispatcher_client.subscribe_skill_details(on_details=self.on_skill_details))
 
         cursor = self.sqlite_connector.cursor()
 
@@ -82,39 +283,38 @@ class Manager(object):
         power INTEGER
         )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS skill_chart_skill_id_calc_time ON skill_chart (skill_id, calc_time)')
         self.sqlite_connector.commit()
 
         for call_direct_address in self.config.call_direct_addresses:
             self.call_direct_clients.append(CallDirectClient(config=self.config,
+                                                             connection_pool=self.connection_pool,
                                                              api_url=call_direct_address))
+        asyncio.create_task(self.call_pacer.start_pacer())
+        asyncio.create_task(self.control_scheduler.start_scheduler())
+        if self.skill_lease_store:
+            asyncio.create_task(self.background_renew_leases())
 
         try:
             while self.config.wait_shutdown is False:
                 await self.smart_sleep(5 if self.skill_units else 1)
 
-                active_skills: list[int] = await self.oper_dispatcher_client.get_active_skills()
-                self.log.info(f"Active skills in OperDispatcher : {active_skills}")
-                for skill_id in active_skills:
-                    if skill_id not in self.skill_units.keys():
-                        skill_unit = SkillUnit(config=self.config,
-                                               oper_dispatcher_client=self.oper_dispatcher_client,
-                                               db_buffer_client=self.db_buffer_client,
-                                               call_direct_clients=self.call_direct_clients,
-                                               sqlite_connector=self.sqlite_connector,
-                                               skill_id=skill_id)
-                        self.skill_units[skill_id] = skill_unit
-                        skill_unit.switch_active(active=True)
-                        asyncio.create_task(skill_unit.start_booster())
-
-                for skill_id in self.skill_units:
-                    if skill_id not in active_skills:
-                        self.skill_units[skill_id].switch_active(active=False)
-                    else:
-                        self.skill_units[skill_id].switch_active(active=True)
+                self.active_skills = await self.oper_dispatcher_client.get_active_skills()
+                self.log.info(f"Active skills in OperDispatcher : {self.active_skills}")
+                if self.skill_lease_store:
+                    await self.renew_leases()
+                else:
+                    self.skill_supervisor.set_active_skills(self.active_skills)
+                if self.restored_states:
+                    self.return_restored_leads()
 
         except asyncio.CancelledError:
             self.log.warning('asyncio.CancelledError')
 
+        try:
+            await self.drain()
+        except Exception as e:
+            self.log.exception(e)
         await self.close_session()
 
         self.log.info('start_manager is end, go kill application')
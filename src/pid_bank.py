@@ -0,0 +1,101 @@
+import numpy as np
+
+
+class PidBank(object):
+    """
+    PID controllers of all skills in arrays, one row per skill, one step for many skills at once
+    The math is the same as simple_pid.PID (proportional on error, derivative on measurement)
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.rows: dict[int, int] = {}  # skill_id => row
+        self.free_rows: list[int] = list(range(capacity - 1, -1, -1))
+        self.kp: np.ndarray = np.zeros(capacity)
+        self.ki: np.ndarray = np.zeros(capacity)
+        self.kd: np.ndarray = np.zeros(capacity)
+        self.setpoint: np.ndarray = np.zeros(capacity)
+        self.output_min: np.ndarray = np.full(capacity, -np.inf)
+        self.output_max: np.ndarray = np.full(capacity, np.inf)
+        self.integral: np.ndarray = np.zeros(capacity)
+        self.last_input: np.ndarray = np.full(capacity, np.nan)  # nan - no input after reset
+        self.last_output: np.ndarray = np.full(capacity, np.nan)
+        self.last_time: np.ndarray = np.zeros(capacity)
+
+    def grow(self):
+        capacity = len(self.kp)
+        for name, fill_value in (('kp', 0.0), ('ki', 0.0), ('kd', 0.0), ('setpoint', 0.0),
+                                 ('output_min', -np.inf), ('output_max', np.inf), ('integral', 0.0),
+                                 ('last_input', np.nan), ('last_output', np.nan), ('last_time', 0.0)):
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(capacity, fill_value)]))
+        self.free_rows.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def add(self, skill_id: int, now: float) -> int:
+        if not self.free_rows:
+            self.grow()
+        row = self.free_rows.pop()
+        self.rows[skill_id] = row
+        self.kp[row] = self.ki[row] = self.kd[row] = self.setpoint[row] = 0
+        self.output_min[row] = -np.inf
+        self.output_max[row] = np.inf
+        self.reset(skill_id, now)
+        return row
+
+    def remove(self, skill_id: int):
+        row = self.rows.pop(skill_id, None)
+        if row is not None:
+            self.free_rows.append(row)
+
+    def reset(self, skill_id: int, now: float):
+        row = self.rows[skill_id]
+        self.integral[row] = np.clip(0, self.output_min[row], self.output_max[row])
+        self.last_input[row] = np.nan
+        self.last_output[row] = np.nan
+        self.last_time[row] = now
+
+    def reset_many(self, skill_ids: list[int], now: float):
+        """The same as reset for every skill in one pass over arrays"""
+        rows = np.fromiter((self.rows[skill_id] for skill_id in skill_ids), dtype=np.int64, count=len(skill_ids))
+        self.integral[rows] = np.clip(0, self.output_min[rows], self.output_max[rows])
+        self.last_input[rows] = np.nan
+        self.last_output[rows] = np.nan
+        self.last_time[rows] = now
+
+    def set_tunings(self, skill_id: int, kp: float, ki: float, kd: float):
+        row = self.rows[skill_id]
+        self.kp[row], self.ki[row], self.kd[row] = kp, ki, kd
+
+    def set_output_limits(self, skill_id: int, output_min: float, output_max: float):
+        row = self.rows[skill_id]
+        self.output_min[row], self.output_max[row] = output_min, output_max
+        self.integral[row] = np.clip(self.integral[row], output_min, output_max)
+
+    def set_setpoint(self, skill_id: int, setpoint: float):
+        self.setpoint[self.rows[skill_id]] = setpoint
+
+    def step(self, skill_ids: list[int], inputs: np.ndarray, now: float) -> np.ndarray:
+        """
+        New output of controllers
+
+        @param skill_ids: Skills for this step
+        @param inputs: Measured value of every skill
+        @param now: Monotonic time
+        @return output of every skill
+        """
+        rows = np.fromiter((self.rows[skill_id] for skill_id in skill_ids), dtype=np.int64, count=len(skill_ids))
+        dt = now - self.last_time[rows]
+        dt[dt <= 0] = 1e-16
+
+        error = self.setpoint[rows] - inputs
+        last_input = self.last_input[rows]
+        d_input = np.where(np.isnan(last_input), 0.0, inputs - last_input)
+
+        output_min = self.output_min[rows]
+        output_max = self.output_max[rows]
+        integral = np.clip(self.integral[rows] + self.ki[rows] * error * dt, output_min, output_max)
+        output = np.clip(self.kp[rows] * error + integral - self.kd[rows] * d_input / dt, output_min, output_max)
+
+        self.integral[rows] = integral
+        self.last_input[rows] = inputs
+        self.last_output[rows] = output
+        self.last_time[rows] = now
+        return output
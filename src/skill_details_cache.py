@@ -0,0 +1,44 @@
+import time
+from typing import Optional
+
+from loguru import logger
+
+
+class SkillDetailsCache(object):
+    """Last skill details from OperDispatcher, Manager fills it and every SkillUnit reads it"""
+
+    def __init__(self):
+        self.details: dict[int, dict] = {}
+        self.update_times: dict[int, float] = {}
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+    def update(self, skill_id: int, details: dict):
+        self.details[skill_id] = details
+        self.update_times[skill_id] = time.monotonic()
+
+    def touch(self, skill_id: int):
+        """Details are still actual, for example the stream of changes has no news about skill"""
+        if skill_id in self.update_times:
+            self.update_times[skill_id] = time.monotonic()
+
+    def get_age(self, skill_id: int) -> float:
+        """Seconds since the last update of skill, inf if skill was never updated"""
+        if skill_id not in self.update_times:
+            return float('inf')
+        return time.monotonic() - self.update_times[skill_id]
+
+    def get(self, skill_id: int, max_age: float) -> Optional[dict]:
+        """
+        Details of skill if they are fresh enough
+
+        @param skill_id: Skill from OperDispatcher
+        @param max_age: Details older than this (seconds) are not returned
+        @return details or None
+        """
+        if self.get_age(skill_id) > max_age:
+            return None
+        return self.details[skill_id]
+
+    def remove(self, skill_id: int):
+        self.details.pop(skill_id, None)
+        self.update_times.pop(skill_id, None)
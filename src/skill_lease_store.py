@@ -0,0 +1,96 @@
+import math
+import sqlite3
+import time
+
+from loguru import logger
+
+
+class SkillLeaseStore(object):
+    """
+    Time-limited leases of skills in a SQLite file shared by all workers
+    Every worker owns about 1/N of active skills, leases of a dead worker expire and go to others
+    """
+
+    def __init__(self, db_path: str, worker_id: str, lease_time: int = 30):
+        """
+        @param db_path: File path of SQLite database, the same for all workers
+        @param worker_id: Unique name of this worker
+        @param lease_time: Seconds when lease and heartbeat are valid without renewal
+        """
+        self.db_path: str = db_path
+        self.worker_id: str = worker_id
+        self.lease_time: int = lease_time
+        self.log = logger.bind(object_id=f'{self.__class__.__name__}#{worker_id}')
+
+        # autocommit mode, transactions are opened by BEGIN IMMEDIATE,
+        # wait for the lock of other workers is short compared with lease_time
+        self.sqlite_connector = sqlite3.connect(db_path, timeout=min(10, lease_time / 10), isolation_level=None,
+                                                check_same_thread=False)
+        cursor = self.sqlite_connector.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS skill_lease (
+        skill_id INTEGER PRIMARY KEY,
+        worker_id TEXT NOT NULL,
+        expires_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS worker_heartbeat (
+        worker_id TEXT PRIMARY KEY,
+        heartbeat_at REAL NOT NULL
+        )
+        ''')
+
+    def acquire(self, active_skills: list[int]) -> list[int]:
+        """
+        Renew leases of this worker, take free skills up to the fair share and give back the surplus
+
+        @param active_skills: Active skills from OperDispatcher
+        @return skills that this worker owns now
+        """
+        now = time.time()
+        cursor = self.sqlite_connector.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('INSERT OR REPLACE INTO worker_heartbeat (worker_id, heartbeat_at) VALUES (?, ?)',
+                           (self.worker_id, now))
+            cursor.execute('DELETE FROM worker_heartbeat WHERE heartbeat_at < ?', (now - self.lease_time,))
+            cursor.execute('DELETE FROM skill_lease WHERE expires_at < ?', (now,))
+
+            cursor.execute('SELECT COUNT(*) FROM worker_heartbeat')
+            count_workers = cursor.fetchone()[0]
+            fair_share = math.ceil(len(active_skills) / max(count_workers, 1))
+
+            cursor.execute('SELECT skill_id, worker_id FROM skill_lease')
+            owners = dict(cursor.fetchall())
+            active = set(active_skills)
+            owned = sorted(skill_id for skill_id, worker_id in owners.items()
+                           if worker_id == self.worker_id and skill_id in active)
+            free = sorted(skill_id for skill_id in active if skill_id not in owners)
+
+            surplus = owned[fair_share:]
+            owned = sorted(owned[:fair_share] + free[:max(0, fair_share - len(owned))])
+
+            # surplus and skills that are not active anymore
+            cursor.execute('DELETE FROM skill_lease WHERE worker_id = ? AND skill_id NOT IN '
+                           f'({", ".join("?" * len(owned))})', [self.worker_id] + owned)
+            cursor.executemany('INSERT OR REPLACE INTO skill_lease (skill_id, worker_id, expires_at) VALUES (?, ?, ?)',
+                               [(skill_id, self.worker_id, now + self.lease_time) for skill_id in owned])
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+
+        if surplus:
+            self.log.info(f'give back skills {surplus}, fair_share={fair_share} workers={count_workers}')
+        return owned
+
+    def release_all(self):
+        """Leases of this worker go to others without waiting for expiry"""
+        cursor = self.sqlite_connector.cursor()
+        cursor.execute('DELETE FROM skill_lease WHERE worker_id = ?', (self.worker_id,))
+        cursor.execute('DELETE FROM worker_heartbeat WHERE worker_id = ?', (self.worker_id,))
+
+    def close(self):
+        self.release_all()
+        self.sqlite_connector.close()
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from typing import Callable
+
+from loguru import logger
+
+from src.config import Config
+from src.http_clients.db_buffer_client import DbBufferClient
+from src.skill_unit import SkillUnit
+
+
+class SkillSupervisor(object):
+    """
+    Owns SkillUnit of every skill and all tasks of units, PID of units is run by ControlScheduler
+    Crashed task is started again with backoff, unit that is inactive longer than skill_unit_idle_ttl is removed,
+    leads of removed unit go back to DbBuffer
+    """
+
+    def __init__(self, config: Config, create_skill_unit: Callable[[int], SkillUnit]):
+        self.config: Config = config
+        self.create_skill_unit: Callable[[int], SkillUnit] = create_skill_unit
+        self.skill_units: dict[int, SkillUnit] = {}
+        self.tasks: dict[int, dict[str, asyncio.Task]] = {}
+        self.task_start_times: dict[tuple[int, str], float] = {}
+        self.restart_counts: dict[tuple[int, str], int] = {}
+        self.inactive_since: dict[int, float] = {}
+        self.count_restarts: int = 0
+        self.count_evicted: int = 0
+        self.lead_tasks: set[asyncio.Task] = set()  # leads of removed units on the way back to DbBuffer
+        self.count_returned_leads: int = 0
+        self.count_lost_leads: int = 0  # DbBuffer did not take them back
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+    def add_skill(self, skill_id: int):
+        skill_unit = self.create_skill_unit(skill_id)
+        self.skill_units[skill_id] = skill_unit
+        self.tasks[skill_id] = {}
+        skill_unit.switch_active(active=True)
+        for name in skill_unit.get_background_tasks():
+            self.start_task(skill_id, name)
+
+    def start_task(self, skill_id: int, name: str, delay: float = 0):
+        skill_unit = self.skill_units.get(skill_id)
+        if skill_unit is None:
+            return
+
+        async def run():
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.task_start_times[(skill_id, name)] = time.monotonic()
+            await skill_unit.get_background_tasks()[name]()
+
+        task = asyncio.create_task(run())
+        task.add_done_callback(lambda done_task: self.on_task_done(skill_id, name, done_task))
+        self.tasks[skill_id][name] = task
+
+    def start_refresh_details(self, skill_id: int):
+        """
+        One request of skill details, it is cancelled with other tasks when unit is removed
+
+        @param skill_id: Skill without fresh details in cache
+        @return None
+        """
+        skill_unit = self.skill_units.get(skill_id)
+        task = self.tasks.get(skill_id, {}).get('refresh_details')
+        if skill_unit is None or (task is not None and not task.done()):
+            return
+
+        task = asyncio.create_task(skill_unit.refresh_skill_details())
+        task.add_done_callback(lambda done_task: self.on_refresh_done(skill_id, done_task))
+        self.tasks[skill_id]['refresh_details'] = task
+
+    def on_refresh_done(self, skill_id: int, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.log.opt(exception=task.exception()).warning(f'refresh details of skill_id={skill_id} failed')
+
+    def on_task_done(self, skill_id: int, name: str, task: asyncio.Task):
+        if task.cancelled() or self.config.wait_shutdown or self.tasks.get(skill_id, {}).get(name) is not task:
+            return
+
+        key = (skill_id, name)
+        # task that worked long enough starts again without backoff
+        if time.monotonic() - self.task_start_times.get(key, 0) > self.config.skill_task_restart_max_delay:
+            self.restart_counts[key] = 0
+        delay = min(self.config.skill_task_restart_delay * 2 ** self.restart_counts.get(key, 0),
+                    self.config.skill_task_restart_max_delay)
+        self.restart_counts[key] = self.restart_counts.get(key, 0) + 1
+        self.count_restarts += 1
+
+        if task.exception() is not None:
+            self.log.opt(exception=task.exception()).error(f'task {name} of skill_id={skill_id} crashed, '
+                                                           f'restart in {delay} seconds')
+        else:
+            self.log.warning(f'task {name} of skill_id={skill_id} ended, restart in {delay} seconds')
+        self.start_task(skill_id, name, delay=delay)
+
+    def remove_skill(self, skill_id: int, return_leads: bool = True):
+        """
+        Stop tasks and close unit of skill
+
+        @param skill_id: Skill of unit
+        @param return_leads: False if leads of unit are kept somewhere else (snapshot of drain)
+        @return None
+        """
+        for task in self.tasks.pop(skill_id, {}).values():
+            task.cancel()
+        for key in [key for key in self.restart_counts if key[0] == skill_id]:
+            self.restart_counts.pop(key, None)
+        for key in [key for key in self.task_start_times if key[0] == skill_id]:
+            self.task_start_times.pop(key, None)
+        self.inactive_since.pop(skill_id, None)
+        skill_unit = self.skill_units.pop(skill_id, None)
+        if skill_unit is None:
+            return
+
+        leads = skill_unit.close()
+        if leads and return_leads:
+            self.start_return_leads(skill_unit.db_buffer_client, skill_unit.skill_id, leads)
+
+    def release_leads(self, skill_id: int):
+        """Skill went to another worker: leads that are not dialed yet go back to DbBuffer for the new owner"""
+        skill_unit = self.skill_units.get(skill_id)
+        if skill_unit is None:
+            return
+
+        leads = skill_unit.take_undialed_leads()
+        if leads:
+            self.start_return_leads(skill_unit.db_buffer_client, skill_unit.skill_id, leads)
+
+    def start_return_leads(self, db_buffer_client: DbBufferClient, skill_id: int, leads: list[dict]):
+        """Leads go back to DbBuffer in a task, close waits for it"""
+        task = asyncio.create_task(self.return_leads(db_buffer_client, skill_id, leads))
+        self.lead_tasks.add(task)
+        task.add_done_callback(self.lead_tasks.discard)
+
+    async def return_leads(self, db_buffer_client: DbBufferClient, skill_id: int, leads: list[dict]):
+        success = False
+        try:
+            success = await db_buffer_client.return_leads(skill_id=skill_id, leads=leads)
+        except Exception as e:
+            self.log.exception(e)
+
+        if success:
+            self.count_returned_leads += len(leads)
+            self.log.info(f'{len(leads)} leads of skill_id={skill_id} are returned to DbBuffer')
+        else:
+            self.count_lost_leads += len(leads)
+            self.log.error(f'{len(leads)} leads of skill_id={skill_id} are not returned to DbBuffer, '
+                           f'lead_id: {[lead.get("lead_id") for lead in leads]}')
+
+    def set_active_skills(self, active_skills: list[int]):
+        """
+        Start units for new skills, switch activity of others and remove units idle longer than TTL
+
+        @param active_skills: Active skills from OperDispatcher
+        @return None
+        """
+        now = time.monotonic()
+        for skill_id in active_skills:
+            if skill_id not in self.skill_units:
+                self.add_skill(skill_id)
+
+        for skill_id in list(self.skill_units):
+            active = skill_id in active_skills
+            self.skill_units[skill_id].switch_active(active=active)
+            if active:
+                self.inactive_since.pop(skill_id, None)
+                continue
+
+            inactive_since = self.inactive_since.setdefault(skill_id, now)
+            if now - inactive_since > self.config.skill_unit_idle_ttl:
+                self.log.info(f'remove skill_id={skill_id}, inactive {round(now - inactive_since)} seconds')
+                self.remove_skill(skill_id)
+                self.count_evicted += 1
+
+    async def close(self, return_leads: bool = True):
+        """
+        Remove all units and wait until their leads are back in DbBuffer
+
+        @param return_leads: False if leads are saved in snapshot of drain
+        @return None
+        """
+        for skill_id in list(self.skill_units):
+            self.remove_skill(skill_id, return_leads=return_leads)
+        if self.lead_tasks:
+            await asyncio.gather(*self.lead_tasks, return_exceptions=True)
@@ -1,16 +1,18 @@
-import asyncio
-import random
 import sqlite3
+import time
 from datetime import datetime
+from typing import Callable, Coroutine, Optional
 
 from loguru import logger
 
 from src.config import Config
-from simple_pid import PID
 
-from src.http_clients.call_direct_client import CallDirectClient
+from src.call_pacer import CallPacer
 from src.http_clients.db_buffer_client import DbBufferClient
 from src.http_clients.oper_dispatcher_client import OperDispatcherClient
+from src.lead_buffer import LeadBuffer
+from src.pid_bank import PidBank
+from src.skill_details_cache import SkillDetailsCache
 
 
 class SkillUnit(object):
@@ -19,20 +21,28 @@ class SkillUnit(object):
                  skill_id: int,
                  sqlite_connector: sqlite3.Connection,
                  oper_dispatcher_client: OperDispatcherClient,
-                 call_direct_clients: list[CallDirectClient],
-                 db_buffer_client: DbBufferClient):
+                 call_pacer: CallPacer,
+                 db_buffer_client: DbBufferClient,
+                 skill_details_cache: SkillDetailsCache,
+                 pid_bank: PidBank):
         self.config: Config = config
         self.skill_id: int = skill_id
         self.sqlite_connector: sqlite3.Connection = sqlite_connector
         self.oper_dispatcher_client: OperDispatcherClient = oper_dispatcher_client
-        self.call_direct_clients: list[CallDirectClient] = call_direct_clients
+        self.call_pacer: CallPacer = call_pacer
         self.db_buffer_client: DbBufferClient = db_buffer_client
+        self.skill_details_cache: SkillDetailsCache = skill_details_cache
+        self.lead_buffer: LeadBuffer = LeadBuffer(config=config, skill_id=skill_id, db_buffer_client=db_buffer_client)
+        self.lead_buffer.on_refill = self.on_lead_refill
+        self.lead_shortfall: int = 0  # leads of this cycle that were not in the buffer
         self.active: bool = False
         self.current_all: int = 0
         self.current_online: int = 0
         self.current_busy: int = 0
         self.current_wait: int = 0
         self.current_power: int = 0
+        self.max_power: int = 200
+        self.power_limit: float = self.max_power  # max_power or less if the budget of in-flight calls is low
         self.wanted_ratio: float = 0.99
         self.kp: float = 0.0
         self.ki: float = 0.0
@@ -40,102 +50,198 @@ class SkillUnit(object):
         self.update_time: int = 10
         self.start_time = datetime.now()
         self.last_time = datetime.now()
-        self.pid = PID(self.kp, self.ki, self.kd, setpoint=self.current_online)
+        self.next_control_time: float = time.monotonic() + self.update_time  # ControlScheduler runs PID after it
+
+        # PID of skill is a row in pid_bank, ControlScheduler runs all rows in one step
+        self.pid_bank: PidBank = pid_bank
+        self.pid_bank.add(skill_id=skill_id, now=time.monotonic())
+        self.pid_bank.set_output_limits(skill_id=skill_id, output_min=0, output_max=self.max_power)
+        # tunings are ready before the first step, a restored unit steps on the next tick
+        self.refresh_pid_params()
 
         self.log = logger.bind(object_id=f'{self.__class__.__name__}-{skill_id}')
 
-    def new_row_skill_chart(self) -> None:
-        """Add new row in skill_chart"""
-        try:
-            cursor = self.sqlite_connector.cursor()
-            cursor.execute(' INSERT INTO skill_chart '
-                           ' (skill_id, calc_time, cnt_online, cnt_busy, '
-                           '  cnt_wait_oper, power) '
-                           ' VALUES (?, ?, ?, ?, ?, ?)',
-                           (self.skill_id, datetime.now().isoformat(), self.current_online, self.current_busy,
-                            self.current_wait, self.current_power))
-            self.sqlite_connector.commit()
-        except Exception as e:
-            self.log.warning(e)
+    def get_skill_chart_row(self) -> tuple:
+        """New row for skill_chart, ControlScheduler inserts rows of all skills in one transaction"""
+        return (self.skill_id, datetime.now().isoformat(), self.current_online, self.current_busy,
+                self.current_wait, self.current_power)
+
+    def close(self) -> list[dict]:
+        """
+        Unit is removed by SkillSupervisor
+
+        @return leads that were taken from DbBuffer and not dialed
+        """
+        self.pid_bank.remove(skill_id=self.skill_id)
+        self.skill_details_cache.remove(skill_id=self.skill_id)
+        self.lead_buffer.on_refill = None
+        return self.take_undialed_leads()
+
+    def take_undialed_leads(self) -> list[dict]:
+        """
+        Leads in the queue of CallPacer and in lead_buffer, they are not dialed by this unit anymore
+
+        @return leads that were taken from DbBuffer and not dialed
+        """
+        leads = self.call_pacer.remove_leads(skill_id=self.skill_id) + list(self.lead_buffer.leads)
+        self.lead_buffer.leads.clear()
+        self.lead_shortfall = 0
+        return leads
 
     def switch_active(self, active: bool):
         if self.active != active:
             self.active = active
             self.log.info(f'new active = {active} for skill_id={self.skill_id}')
-
-    async def get_leads(self) -> list[dict]:
-        if self.current_power <= 0:
+            if not active:
+                self.lead_buffer.set_demand(0)
+                self.lead_shortfall = 0
+
+    def get_state(self, pending_leads: Optional[list[dict]] = None) -> dict:
+        """
+        State for snapshot
+
+        @param pending_leads: Leads of skill in the queue of CallPacer, None - snapshot without leads
+        @return state
+        """
+        state = {
+            "current_power": self.current_power,
+            "update_time": self.update_time,
+            # PID starts from zero every cycle, power of the first cycle comes from these counts of opers
+            "skill_detail": {
+                "all": self.current_all,
+                "online": self.current_online,
+                "busy": self.current_busy,
+                "wait": self.current_wait
+            }
+        }
+        if pending_leads is not None:
+            state['leads'] = pending_leads + list(self.lead_buffer.leads)
+        return state
+
+    def restore_state(self, state: dict):
+        """
+        State from snapshot of the previous process, the first step of PID is on the next tick
+        with the last counts of opers, fresh details replace them when they come
+        """
+        now = time.monotonic()
+        self.current_power = state.get('current_power', 0)
+        self.update_time = state.get('update_time', self.update_time)
+        self.apply_skill_details(state.get('skill_detail', {}))
+        self.lead_buffer.leads.extendleft(reversed(state.get('leads', [])))
+        self.next_control_time = now
+        self.log.info(f'restored power={self.current_power} online={self.current_online} '
+                      f'leads={len(state.get("leads", []))}')
+
+    def get_background_tasks(self) -> dict[str, Callable[[], Coroutine]]:
+        """Tasks of unit, SkillSupervisor starts them and restarts them after crash"""
+        return {
+            'lead_refill': self.lead_buffer.background_refill
+        }
+
+    def get_leads(self) -> list[dict]:
+        """Leads for this cycle from lead_buffer, it is refilled in the background"""
+        batch_size = int(self.current_power * self.update_time) if self.current_power > 0 else 0
+        self.lead_buffer.set_demand(batch_size)
+        self.lead_shortfall = 0
+        if batch_size == 0:
             return []
 
-        batch_size = int(self.current_power * self.update_time)
-
-        while self.config.wait_shutdown is False:
-            leads = await self.db_buffer_client.get_leads(batch_size=batch_size,
-                                                          skill_id=self.skill_id)
-            if leads:
-                return leads
-            else:
-                self.log.debug(f'not found lead for skill_id={self.skill_id}')
-                self.pid.reset()
-                self.current_power = 0
-                await asyncio.sleep(self.update_time)
-
-    async def background_refresh_pid_params(self):
-        while self.config.wait_shutdown is False:
-            await asyncio.sleep(5)
-            # await new_pid_params = http_get_request(blabla)
-            self.pid.tunings = (1, 0.01, 0.01)
-            self.pid.output_limits = (0, 200)
-            self.wanted_ratio: float = 0.99
-            self.update_time: int = 5
-
-    async def background_refresh_oper_stats(self):
-        while self.config.wait_shutdown is False:
-            await asyncio.sleep(5)
+        leads = self.lead_buffer.take(batch_size)
+        if not leads and self.lead_buffer.exhausted:
+            self.log.debug(f'not found lead for skill_id={self.skill_id}')
+            self.pid_bank.reset(skill_id=self.skill_id, now=time.monotonic())
+            self.current_power = 0
+        else:
+            self.lead_shortfall = batch_size - len(leads)
+        return leads
+
+    def on_lead_refill(self):
+        """
+        Leads that were missing at the start of the cycle (first cycle or a jump of power)
+        are dialed in the rest of the cycle with the same power when the refill lands
+        """
+        if self.lead_shortfall <= 0 or not self.active or self.current_power <= 0:
+            return
+
+        rest_time = self.next_control_time - time.monotonic()
+        count = min(self.lead_shortfall, int(self.current_power * rest_time))
+        self.lead_shortfall = 0
+        if count <= 0:
+            return
+
+        leads = self.lead_buffer.take(count)
+        self.call_pacer.schedule(skill_id=self.skill_id, leads=leads, interval=rest_time)
+        self.log.info(f'shortfall of cycle: {len(leads)} leads in {round(rest_time, 1)} seconds')
+
+    async def get_skill_details(self) -> dict:
+        """Details from skill_details_cache, request to OperDispatcher only if Manager has not refreshed them"""
+        skill_detail = self.skill_details_cache.get(skill_id=self.skill_id, max_age=self.config.skill_details_max_age)
+        if skill_detail is None:
             skill_detail = await self.oper_dispatcher_client.get_skill_details(skill_id=self.skill_id)
-            self.current_all = skill_detail.get('all', 0)
-            self.current_online = skill_detail.get('online', 0)
-            self.current_busy = skill_detail.get('busy', 0)
-            self.current_wait = skill_detail.get('wait', 0)
-            self.log.info(f'skill_detail={skill_detail} power={self.current_power}')
-            self.new_row_skill_chart()
-
-    async def start_booster(self):
-        """Booster for start_call"""
-
-        asyncio.create_task(self.background_refresh_pid_params())
-        asyncio.create_task(self.background_refresh_oper_stats())
-
-        self.pid.output_limits = (0, 200)
-
-        while self.config.wait_shutdown is False:
-            if self.active:
-                await asyncio.sleep(self.update_time)
-                self.pid.reset()
-                self.current_power = 0
-            else:
-                await asyncio.sleep(1)
-                continue
-
-            skill_detail = await self.oper_dispatcher_client.get_skill_details(skill_id=self.skill_id)
-
-            self.current_power = int(self.pid(self.current_busy + self.current_wait))
-
-            self.current_all = skill_detail.get('all', 0)
-            self.current_online = skill_detail.get('online', 0)
-            self.current_busy = skill_detail.get('busy', 0)
-            self.current_wait = skill_detail.get('wait', 0)
-
-            self.log.info(f'skill_detail={skill_detail} power={self.current_power}')
-            self.new_row_skill_chart()
-
-            self.pid.setpoint = int(self.current_online * self.wanted_ratio)
-
-            leads = await self.get_leads()
-            if leads:
-                for lead in leads:
-                    delay = round(random.uniform(0, self.update_time), 3)
-                    call_direct_client: CallDirectClient = random.choice(self.call_direct_clients)
-                    asyncio.create_task(call_direct_client.start_call(lead=lead, delay=delay))
-            else:
-                self.log.warning(f'leads={leads}')
+            if skill_detail is None:
+                return {}
+            self.skill_details_cache.update(skill_id=self.skill_id, details=skill_detail)
+
+        return skill_detail
+
+    def apply_skill_details(self, skill_detail: dict):
+        """New counts of opers from polling or from the stream of OperDispatcher"""
+        self.current_all = skill_detail.get('all', 0)
+        self.current_online = skill_detail.get('online', 0)
+        self.current_busy = skill_detail.get('busy', 0)
+        self.current_wait = skill_detail.get('wait', 0)
+
+    async def refresh_skill_details(self):
+        """Request to OperDispatcher when Manager has no fresh details of this skill"""
+        skill_detail = await self.get_skill_details()
+        if skill_detail:
+            self.apply_skill_details(skill_detail)
+
+    def refresh_pid_params(self):
+        # new_pid_params = http_get_request(blabla)
+        self.kp, self.ki, self.kd = 1, 0.01, 0.01
+        self.pid_bank.set_tunings(skill_id=self.skill_id, kp=self.kp, ki=self.ki, kd=self.kd)
+        self.wanted_ratio: float = 0.99
+        self.update_time: int = 5
+
+    def stop_booster(self):
+        """Skill is inactive: no power and PID starts from zero when skill is active again"""
+        if self.current_power != 0:
+            self.log.info(f'stop booster, power={self.current_power}')
+        self.pid_bank.reset(skill_id=self.skill_id, now=time.monotonic())
+        self.current_power = 0
+        self.lead_shortfall = 0
+
+    def prepare_control(self) -> float:
+        """
+        Setpoint and limits of PID before the step of ControlScheduler
+
+        @return measured value for PID
+        """
+        # calls in the queue of CallPacer and without answer of CallDirect use the budget of skill,
+        # the limit of PID output keeps power and fetching of leads inside the budget without windup
+        in_flight = self.call_pacer.get_in_flight(self.skill_id)
+        free_budget = max(0, self.config.skill_max_in_flight - in_flight)
+        self.power_limit = min(self.max_power, free_budget / self.update_time)
+        self.pid_bank.set_output_limits(skill_id=self.skill_id, output_min=0, output_max=self.power_limit)
+        self.pid_bank.set_setpoint(skill_id=self.skill_id, setpoint=int(self.current_online * self.wanted_ratio))
+        return self.current_busy + self.current_wait
+
+    def apply_power(self, power: float, now: float):
+        """
+        New power from the step of ControlScheduler, leads for this cycle go to CallPacer
+
+        @param power: Output of PID
+        @param now: Monotonic time of the step
+        @return None
+        """
+        self.current_power = int(power)
+        self.next_control_time = now + self.update_time
+        if self.power_limit < self.max_power and self.current_power >= int(self.power_limit):
+            self.log.info(f'in_flight={self.call_pacer.get_in_flight(self.skill_id)} limits power={self.current_power}')
+
+        leads = self.get_leads()
+        if leads:
+            self.call_pacer.schedule(skill_id=self.skill_id, leads=leads, interval=self.update_time)
+        elif self.lead_shortfall > 0:
+            self.log.info(f'no leads in buffer, {self.lead_shortfall} leads wait for refill')
@@ -0,0 +1,75 @@
+import os
+import time
+from typing import Optional
+
+from loguru import logger
+
+from src.json_codec import dumps, loads
+
+
+class StateSnapshot(object):
+    """
+    State of skills in a json file, a new process loads it on startup and starts from the same power
+    Leads are saved only by the graceful drain, after a crash they could be already dialed
+    """
+
+    def __init__(self, path: str, max_age: int):
+        """
+        @param path: File path of snapshot
+        @param max_age: Older snapshot (seconds) is ignored
+        """
+        self.path: str = path
+        self.max_age: int = max_age
+        self.log = logger.bind(object_id=self.__class__.__name__)
+
+    def save(self, skills: dict[int, dict], drained: bool):
+        """
+        Write snapshot atomically: new file is renamed over the old one
+
+        @param skills: State of every skill, see SkillUnit.get_state
+        @param drained: True if calls are stopped and leads in skills are not dialed
+        @return None
+        """
+        snapshot = {
+            "save_time": time.time(),
+            "drained": drained,
+            "skills": skills
+        }
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, "wb") as jsonfile:
+            jsonfile.write(dumps(snapshot))
+        os.replace(tmp_path, self.path)
+        if drained:
+            self.log.info(f'saved drained snapshot: skills={len(skills)} '
+                          f'leads={sum(len(state.get("leads", [])) for state in skills.values())}')
+
+    def load(self) -> dict[int, dict]:
+        """
+        Read and remove snapshot, so the same leads are not loaded twice
+
+        @return state by skill_id, empty if there is no fresh snapshot
+        """
+        snapshot: Optional[dict] = None
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "rb") as jsonfile:
+                    snapshot = loads(jsonfile.read())
+            except Exception as e:
+                self.log.warning(f'bad snapshot {self.path}: {e}')
+            os.remove(self.path)
+
+        if not snapshot:
+            return {}
+
+        age = time.time() - snapshot.get('save_time', 0)
+        if age > self.max_age:
+            self.log.warning(f'snapshot is too old: {round(age)} seconds')
+            return {}
+
+        skills = {int(skill_id): state for skill_id, state in snapshot.get('skills', {}).items()}
+        if not snapshot.get('drained'):
+            for state in skills.values():
+                state.pop('leads', None)
+
+        self.log.info(f'loaded snapshot: age={round(age, 1)} drained={snapshot.get("drained")} skills={list(skills)}')
+        return skills
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Benchmark of json_codec against the standard json module on payloads of call_booster
+Run from the root of the project: python -m tests.bench_json_codec
+"""
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from starlette.responses import JSONResponse
+
+from src.api.api_utils import FastJSONResponse
+from src.json_codec import JSON_BACKEND, dumps, loads
+
+
+def make_leads(count: int) -> list[dict]:
+    """Leads like DbBuffer returns them"""
+    return [{"lead_id": lead_id, "skill_id": 1, "phone": f'7900{lead_id:07d}'} for lead_id in range(count)]
+
+
+def make_chart(batch_size: int = 9999) -> dict:
+    """Answer of /skill/chart/{skill_id} with the biggest batch_size"""
+    start_time = datetime.now()
+    return {
+        "skill_id": 1,
+        "batch_size": batch_size,
+        "labels": [(start_time + timedelta(seconds=5 * i)).isoformat() for i in range(batch_size)],
+        "dataset1": [random.randint(0, 100) for _ in range(batch_size)],
+        "dataset2": [random.randint(0, 100) for _ in range(batch_size)],
+        "dataset3": [random.randint(0, 20) for _ in range(batch_size)],
+        "dataset4": [random.randint(0, 200) for _ in range(batch_size)]
+    }
+
+
+def bench(name: str, stdlib_func, codec_func, number: int):
+    stdlib_time = min(timeit.repeat(stdlib_func, number=number, repeat=5)) / number
+    codec_time = min(timeit.repeat(codec_func, number=number, repeat=5)) / number
+    print(f'{name:<32} json={stdlib_time * 1e6:>10.1f} us  {JSON_BACKEND}={codec_time * 1e6:>10.1f} us  '
+          f'x{stdlib_time / codec_time:.1f}')
+
+
+if __name__ == '__main__':
+    leads = make_leads(1000)
+    leads_body = json.dumps(leads).encode('utf-8')
+    start_batch = {"calls": [{"lead": lead, "offset": i * 0.01} for i, lead in enumerate(leads[:50])]}
+    chart = make_chart()
+    chart_body = json.dumps(chart).encode('utf-8')
+
+    print(f'backend: {JSON_BACKEND}')
+    bench('leads x1000 loads', lambda: json.loads(leads_body), lambda: loads(leads_body), 200)
+    bench('leads x1000 dumps', lambda: json.dumps(leads).encode('utf-8'), lambda: dumps(leads), 200)
+    bench('start_batch x50 dumps', lambda: json.dumps(start_batch).encode('utf-8'), lambda: dumps(start_batch), 2000)
+    bench('chart 9999x5 loads', lambda: json.loads(chart_body), lambda: loads(chart_body), 50)
+    bench('chart 9999x5 JSONResponse', lambda: JSONResponse(content=chart), lambda: FastJSONResponse(content=chart), 50)
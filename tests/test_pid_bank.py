@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+PidBank against simple_pid.PID on the same random steps, the outputs must be the same
+Run from the root of the project: python -m pytest tests/test_pid_bank.py or python -m tests.test_pid_bank
+"""
+import random
+
+import numpy as np
+from simple_pid import PID
+
+from src.pid_bank import PidBank
+
+
+class FakeClock(object):
+    """time_fn of simple_pid, PidBank gets the same time as argument"""
+
+    def __init__(self):
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def compare(count_steps: int, count_skills: int, reset_every_step: bool, seed: int) -> float:
+    """
+    Step PidBank and one simple_pid.PID per skill with random tunings, limits, setpoints, inputs and resets
+
+    @return max difference of outputs
+    """
+    rnd = random.Random(seed)
+    clock = FakeClock()
+    pid_bank = PidBank(capacity=2)  # small capacity, rows grow during the test
+    pids: dict[int, PID] = {}
+    for skill_id in range(1, count_skills + 1):
+        pid_bank.add(skill_id=skill_id, now=clock.now)
+        pids[skill_id] = PID(0, 0, 0, setpoint=0, sample_time=None, time_fn=clock)
+
+    max_diff = 0.0
+    for _ in range(count_steps):
+        clock.now += rnd.choice([0, rnd.uniform(0.001, 10)])
+        skill_ids = rnd.sample(list(pids), rnd.randint(1, count_skills))
+        inputs = np.array([rnd.randint(0, 100) for _ in skill_ids], dtype=float)
+
+        for skill_id in skill_ids:
+            pid = pids[skill_id]
+            if rnd.random() < 0.1:
+                kp, ki, kd = rnd.uniform(0, 5), rnd.uniform(0, 0.1), rnd.uniform(0, 0.1)
+                pid.tunings = (kp, ki, kd)
+                pid_bank.set_tunings(skill_id=skill_id, kp=kp, ki=ki, kd=kd)
+            if rnd.random() < 0.2:
+                output_max = rnd.uniform(0, 200)
+                pid.output_limits = (0, output_max)
+                pid_bank.set_output_limits(skill_id=skill_id, output_min=0, output_max=output_max)
+            if rnd.random() < 0.3:
+                setpoint = rnd.randint(0, 100)
+                pid.setpoint = setpoint
+                pid_bank.set_setpoint(skill_id=skill_id, setpoint=setpoint)
+            if rnd.random() < 0.05:
+                pid.reset()
+                pid_bank.reset(skill_id=skill_id, now=clock.now)
+
+        if reset_every_step:
+            for skill_id in skill_ids:
+                pids[skill_id].reset()
+            pid_bank.reset_many(skill_ids, clock.now)
+
+        outputs = pid_bank.step(skill_ids, inputs, clock.now)
+        for skill_id, input_, output in zip(skill_ids, inputs, outputs):
+            max_diff = max(max_diff, abs(pids[skill_id](float(input_)) - output))
+
+    return max_diff
+
+
+def test_pid_bank_same_as_simple_pid():
+    assert compare(count_steps=2000, count_skills=5, reset_every_step=False, seed=1) == 0
+
+
+def test_pid_bank_reset_every_step():
+    assert compare(count_steps=2000, count_skills=5, reset_every_step=True, seed=2) == 0
+
+
+if __name__ == '__main__':
+    print(f'max diff: {compare(count_steps=2000, count_skills=5, reset_every_step=False, seed=1)}')
+    print(f'max diff with reset every step: {compare(count_steps=2000, count_skills=5, reset_every_step=True, seed=2)}')